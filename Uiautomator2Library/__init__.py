@@ -26,6 +26,7 @@ from __future__ import absolute_import
 from .u2keywords import DeviceActions
 from .u2keywords import UiActions
 from .u2keywords import XpathActions
+from .metrics import metrics
 
 
 class Mobile(DeviceActions, UiActions, XpathActions):
@@ -43,7 +44,17 @@ class Uiautomator2Library(Mobile):
 
     *Before running tests*
 
-    You can use `Set Serial` to specify which device to perform the test.
+    You can use `Connect Device` to specify which device to perform the test.
+
+    Several devices can be driven in one test run, give each of them an alias and use `Switch Device`:
+
+    | Connect Device | 192.168.1.100 | sender   |
+    | Connect Device | 192.168.1.101 | receiver |
+    | Switch Device  | sender        |          |
+
+    With pabot, workers can lease devices of a farm instead of hand-picked serials: set U2LIB_DEVICE_POOL to the
+    comma separated serials (or "adb" for every device adb lists), or use `Configure Device Pool`, and call
+    `Connect Device` without serial. `Disconnect Device` or the end of the worker releases the device.
 
     *Identify UI object*
 
@@ -91,13 +102,59 @@ class Uiautomator2Library(Mobile):
     If you want to use keywords with *[Test Agent]* tag.
 
     You have to install TestAgent.apk (in support folder) to device.
+
+    *Keyword metrics*
+
+    Wall time, device HTTP calls and wait time of every keyword are collected. The p50/p95/max table is added
+    to the top suite metadata when the test run ends, and written to a json file if the library is imported
+    with `metrics_output`:
+
+    | Library | Uiautomator2Library | metrics_output=${OUTPUT_DIR}/keyword_metrics.json |
+
+    *Screenshots*
+
+    After `Dev Configure Screenshots` screenshots are written in background and the last frames are kept in memory.
+    If the library is imported with `screenshot_dir`, the frames kept in memory are written there when a test fails
+    and dropped when it passes:
+
+    | Library | Uiautomator2Library | screenshot_dir=${OUTPUT_DIR}/screenshots |
+
+    *Record and replay*
+
+    `Start Recording` writes every exchange with the device to a trace, `Start Replay Server` serves it from a local
+    stand-in so the same keywords run without phone, e.g. in CI:
+
+    | ${url}         | Start Replay Server | ${CURDIR}/login.jsonl.gz |
+    | Connect Device | ${url}              | replay                   |
     """
     # ROBOT_LIBRARY_VERSION = '0.1'
     # ROBOT_LIBRARY_DOC_FORMAT = 'ROBOT'
     ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+    ROBOT_LISTENER_API_VERSION = 3
     # ROBOT_EXIT_ON_FAILURE = True
 
-    # def __init__(self):
-    #     """
-    #     """
-    #     Mobile.__init__(self)
+    def __init__(self, metrics_output=None, screenshot_dir=None):
+        """
+        :param metrics_output: json file the keyword metrics are written to when the test run ends
+        :param screenshot_dir: directory the screenshots kept in memory are written to when a test fails
+        """
+        super(Uiautomator2Library, self).__init__()
+        self._metrics_output = metrics_output
+        self._screenshot_dir = screenshot_dir
+        self.ROBOT_LIBRARY_LISTENER = self
+
+    def _end_test(self, data, result):
+        if not self._screenshot_dir:
+            return
+        for context in self._registry:
+            if context.screenshots.asynchronous and not result.passed:
+                context.screenshots.flush(self._screenshot_dir, f"{result.longname}-{context.alias}".replace(" ", "_"))
+            else:
+                context.screenshots.clear()
+
+    def _end_suite(self, data, result):
+        if result.parent is not None:
+            return
+        result.metadata["Keyword Metrics"] = metrics.table()
+        if self._metrics_output:
+            self.dump_keyword_metrics(self._metrics_output)
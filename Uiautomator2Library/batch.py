@@ -0,0 +1,53 @@
+# -*- coding:utf-8 -*-
+import json
+
+from .lazy import u2
+
+
+class JsonRpcBatch(object):
+    """
+    JSON-RPC calls to the uiautomator2 server sent in one HTTP request,
+    if the server does not answer batch requests the calls are sent one by one
+    """
+
+    def __init__(self, device):
+        self._device = device
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, *params) -> int:
+        """
+        Queue a call
+        :param method: jsonrpc method name
+        :param params: jsonrpc params
+        :return: position of the call result in the list returned by send
+        """
+        self._calls.append({"jsonrpc": "2.0", "id": len(self._calls) + 1, "method": method, "params": list(params)})
+        return len(self._calls) - 1
+
+    def send(self) -> list:
+        """
+        Send the queued calls and clear the queue
+        :return: list of call results, in the order the calls were added
+        """
+        calls, self._calls = self._calls, []
+        if not calls:
+            return []
+        res = self._device.http.post("/jsonrpc/0", headers={"Content-Type": "application/json"},
+                                     data=json.dumps(calls), timeout=60)
+        try:
+            responses = res.json() if res.status_code == 200 else None
+        except ValueError:
+            responses = None
+        if not isinstance(responses, list):
+            return [getattr(self._device.jsonrpc, call["method"])(*call["params"]) for call in calls]
+        responses = {response.get("id"): response for response in responses}
+        results = []
+        for call in calls:
+            response = responses.get(call["id"], {})
+            if response.get("error"):
+                raise u2.JSONRPCError(response["error"], call["method"])
+            results.append(response.get("result"))
+        return results
@@ -0,0 +1,112 @@
+# -*- coding:utf-8 -*-
+import json
+import re
+import threading
+import time
+
+from .logger import logger
+
+FOCUS_RE = re.compile(r"mCurrentFocus=Window\{.*?\s+(?P<activity>[^\s/]+/[^\s}]+)\}")
+SIZE_RE = re.compile(r"\bcur=(?P<size>\d+x\d+)")
+
+
+def screen_state(device) -> tuple:
+    """
+    Focused activity and window size, read with one shell call
+    :param device: u2.Device
+    :return: (activity, size), None if the activity cannot be read, e.g. a dialog of the system has the focus
+    """
+    output, _ = device.shell("dumpsys window | grep -E 'mCurrentFocus|cur='")
+    focus, size = FOCUS_RE.search(output), SIZE_RE.search(output)
+    if focus is None:
+        return None
+    return focus.group("activity"), size.group("size") if size else ""
+
+
+def locator_key(locator) -> str:
+    """
+    :param locator: kwargs locator dict or xpath string
+    :return: key of the locator in the cache
+    """
+    if isinstance(locator, dict):
+        return json.dumps(locator, sort_keys=True, default=str)
+    return str(locator)
+
+
+class CoordinateCache(object):
+    """
+    Center coordinates of elements by activity and locator, for repeated clicks on static controls such as tab bars
+    and keypads: a hit is a coordinate tap without finding the element on the device. Entries expire after ttl,
+    all entries are dropped when the window size changes (rotation, split screen)
+    """
+
+    def __init__(self, ttl=60.0, activity_ttl=2.0):
+        """
+        :param ttl: seconds an entry is used
+        :param activity_ttl: seconds the screen state read is reused, 0 reads it for every click
+        """
+        self.ttl = ttl
+        self.activity_ttl = activity_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._size = None
+        self._state = None
+        self._state_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def state(self, device):
+        """
+        :param device: u2.Device
+        :return: (activity, size) of screen_state, reused for activity_ttl seconds
+        """
+        now = time.perf_counter()
+        if self._state is None or now - self._state_time > self.activity_ttl:
+            try:
+                self._state = screen_state(device)
+            except Exception as e:
+                logger.debug("screen state read failed: %r", e)
+                self._state = None
+            self._state_time = now
+        return self._state
+
+    def get(self, state, locator):
+        """
+        :param state: screen state of state()
+        :param locator: kwargs locator dict or xpath string
+        :return: (x, y), None on miss
+        """
+        if state is None:
+            self.misses += 1
+            return None
+        activity, size = state
+        with self._lock:
+            if size != self._size:
+                self._entries.clear()
+                self._size = size
+            entry = self._entries.get((activity, locator_key(locator)))
+            if entry is None or time.perf_counter() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, state, locator, center):
+        """
+        :param state: screen state of state() read before the element was found
+        :param locator: kwargs locator dict or xpath string
+        :param center: (x, y)
+        :return:
+        """
+        if state is None:
+            return
+        activity, size = state
+        with self._lock:
+            if size != self._size:
+                self._entries.clear()
+                self._size = size
+            self._entries[(activity, locator_key(locator))] = (center, time.perf_counter())
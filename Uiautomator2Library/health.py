@@ -0,0 +1,112 @@
+# -*- coding:utf-8 -*-
+import json
+import re
+import threading
+import time
+
+from .lazy import u2
+from .logger import logger
+
+
+class HealthMonitor(object):
+    """
+    Background probe of one device: a cheap JSON-RPC call every interval on a session of its own, so probes are
+    neither counted in the keyword metrics nor recorded in traces. When the probe fails the device is connected
+    again with backoff and the new u2.Device replaces the old one in the DeviceContext
+    """
+
+    def __init__(self, context, interval=5.0, fail_fast=True, reconnect=True, probe_timeout=2.0, max_backoff=30.0):
+        self.context = context
+        self.interval = interval
+        self.fail_fast = fail_fast
+        self.probe_timeout = probe_timeout
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.alive = True
+        self.failures = 0
+        self.reconnects = 0
+        self.last_seen = time.time()
+        self.lost_since = None
+        self._session = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"u2-health-{context.alias}", daemon=True)
+
+    @property
+    def state(self) -> dict:
+        return {"alive": self.alive, "failures": self.failures, "reconnects": self.reconnects,
+                "last_seen": self.last_seen, "lost_since": self.lost_since}
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(self.probe_timeout + 1)
+        if self._session is not None:
+            self._session.close()
+
+    def probe(self, device) -> bool:
+        """
+        :param device: u2.Device
+        :return: True if the uiautomator2 server of device answers
+        """
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            res = self._session.post(device.path2url("/jsonrpc/0"), timeout=self.probe_timeout,
+                                     data=json.dumps({"jsonrpc": "2.0", "id": 1, "method": "deviceInfo"}))
+            return res.status_code == 200 and not res.json().get("error")
+        except Exception as e:
+            logger.debug("probe of %s failed: %r", self.context.alias, e)
+            return False
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.wait(self.interval if self.alive else backoff):
+            if self.probe(self.context.device):
+                self._mark_alive()
+                backoff = 1.0
+                continue
+            self.failures += 1
+            if self.alive:
+                self.alive = False
+                self.lost_since = time.time()
+                logger.warning("device %s is not reachable", self.context.alias)
+            if self.reconnect and self._reconnect():
+                self._mark_alive()
+                backoff = 1.0
+            else:
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _mark_alive(self):
+        if not self.alive:
+            logger.info("device %s is reachable again after %.1fs", self.context.alias,
+                        time.time() - self.lost_since)
+        self.alive = True
+        self.lost_since = None
+        self.last_seen = time.time()
+
+    def _reconnect(self) -> bool:
+        """
+        Connect the device again, over USB the uiautomator2 server is restarted if the new connection
+        does not answer either
+        :return: True if the new connection answers
+        """
+        serial_url = self.context.serial_url
+        try:
+            device = u2.connect(serial_url)
+            if not self.probe(device):
+                if serial_url and re.match(r"^https?://", serial_url):
+                    return False
+                device.healthcheck()
+                if not self.probe(device):
+                    return False
+        except Exception as e:
+            logger.debug("reconnect of %s failed: %r", self.context.alias, e)
+            return False
+        self.context.rebind(device)
+        self.reconnects += 1
+        logger.info("device %s reconnected", self.context.alias)
+        return True
@@ -0,0 +1,310 @@
+# -*- coding:utf-8 -*-
+import functools
+import hashlib
+import re
+import threading
+from xml.etree import ElementTree
+
+
+class HierarchyCache(object):
+    """
+    Snapshot of the UI hierarchy of one device, shared by all keywords reading the page
+    The snapshot is dumped once and reused until a screen changing keyword invalidates it, the registered
+    watchers of the device run on each dump as they do when uiautomator2 xpath dumps the hierarchy itself
+    """
+    WATCHER_TRIGGERS = 5
+
+    def __init__(self, device):
+        self._device = device
+        self._source = None
+        self._index = None
+        self._lock = threading.Lock()
+        self.dump_count = 0
+
+    @property
+    def source(self) -> str:
+        """
+        Hierarchy xml of the snapshot, dump it from device if there is no snapshot
+        :return: xml string
+        """
+        with self._lock:
+            if self._source is None:
+                self._source = self._dump()
+            return self._source
+
+    @property
+    def index(self) -> "LocatorIndex":
+        """
+        Locator index over the snapshot, built once per snapshot
+        :return: LocatorIndex
+        """
+        source = self.source
+        with self._lock:
+            if self._index is None or self._index.source is not source:
+                self._index = LocatorIndex(source)
+            return self._index
+
+    def _dump(self) -> str:
+        source = self._device.dump_hierarchy()
+        self.dump_count += 1
+        watcher = getattr(self._device, "watcher", None)
+        for _ in range(self.WATCHER_TRIGGERS):
+            if watcher is None or not watcher.run(source):
+                break
+            source = self._device.dump_hierarchy()
+            self.dump_count += 1
+        return source
+
+    def refresh(self) -> str:
+        """
+        Drop the snapshot and dump a new one
+        :return: xml string
+        """
+        self.invalidate()
+        return self.source
+
+    def invalidate(self):
+        """
+        Drop the snapshot, the next read dumps the hierarchy again
+        :return:
+        """
+        with self._lock:
+            self._source = None
+            self._index = None
+
+
+class LocatorIndex(object):
+    """
+    In-memory index over one hierarchy snapshot answering UiSelector kwargs locators without device round trip
+    """
+    # UiSelector kwargs -> hierarchy node attribute
+    TEXT_ATTRIBUTES = {"text": "text", "className": "class", "description": "content-desc",
+                       "packageName": "package", "resourceId": "resource-id"}
+    BOOL_ATTRIBUTES = {"checkable": "checkable", "checked": "checked", "clickable": "clickable",
+                       "longClickable": "long-clickable", "scrollable": "scrollable", "enabled": "enabled",
+                       "focusable": "focusable", "focused": "focused", "selected": "selected"}
+    SUFFIXES = {"text": ("Contains", "Matches", "StartsWith"), "className": ("Matches",),
+                "description": ("Contains", "Matches", "StartsWith"), "packageName": ("Matches",),
+                "resourceId": ("Matches",)}
+
+    def __init__(self, source: str):
+        self.source = source
+        self._nodes = []
+        self._index = {key: {} for key in self.TEXT_ATTRIBUTES}
+        root = ElementTree.fromstring(source.encode("utf-8"))
+        for node in root.iter("node"):
+            position = len(self._nodes)
+            self._nodes.append(node)
+            for key, attribute in self.TEXT_ATTRIBUTES.items():
+                self._index[key].setdefault(node.get(attribute, ""), []).append(position)
+
+    @classmethod
+    def supports(cls, kwargs) -> bool:
+        """
+        :param kwargs: locator dict
+        :return: True if every key of the locator can be answered by the index
+        """
+        return all(cls._predicate(key) is not None or key in ("index", "instance") for key in kwargs)
+
+    @classmethod
+    def _predicate(cls, key):
+        """
+        :return: (attribute, compare function) of a locator key, None if not supported
+        """
+        if key in cls.TEXT_ATTRIBUTES:
+            return cls.TEXT_ATTRIBUTES[key], lambda actual, expected: actual == str(expected)
+        if key in cls.BOOL_ATTRIBUTES:
+            return cls.BOOL_ATTRIBUTES[key], lambda actual, expected: actual == str(expected).lower()
+        for name, suffixes in cls.SUFFIXES.items():
+            for suffix in suffixes:
+                if key == name + suffix:
+                    attribute = cls.TEXT_ATTRIBUTES[name]
+                    if suffix == "Contains":
+                        return attribute, lambda actual, expected: str(expected) in actual
+                    elif suffix == "StartsWith":
+                        return attribute, lambda actual, expected: actual.startswith(str(expected))
+                    else:
+                        return attribute, lambda actual, expected: re.fullmatch(str(expected), actual) is not None
+        return None
+
+    def find(self, **kwargs) -> list:
+        """
+        Find nodes matching the locator
+        :param kwargs: locator dict
+        :return: list of ElementTree nodes in document order
+        """
+        candidates = None
+        for key in self.TEXT_ATTRIBUTES:
+            if key in kwargs:
+                positions = self._index[key].get(str(kwargs[key]), [])
+                if candidates is None or len(positions) < len(candidates):
+                    candidates = positions
+        nodes = self._nodes if candidates is None else [self._nodes[i] for i in candidates]
+        for key, expected in kwargs.items():
+            if key == "instance":
+                continue
+            if key == "index":
+                nodes = [node for node in nodes if node.get("index") == str(expected)]
+                continue
+            predicate = self._predicate(key)
+            if predicate is None:
+                raise TypeError(f"LocatorIndex does not support locator key '{key}'")
+            attribute, compare = predicate
+            nodes = [node for node in nodes if compare(node.get(attribute, ""), expected)]
+        if "instance" in kwargs:
+            instance = int(kwargs["instance"])
+            nodes = nodes[instance:instance + 1]
+        return nodes
+
+    def count(self, **kwargs) -> int:
+        return len(self.find(**kwargs))
+
+    def exists(self, **kwargs) -> bool:
+        return bool(self.find(**kwargs))
+
+    def info(self, **kwargs):
+        """
+        Info dict of the first node matching the locator, same keys as UiObject.info
+        :param kwargs: locator dict
+        :return: info dict, None if no node matches
+        """
+        nodes = self.find(**kwargs)
+        return node_info(nodes[0]) if nodes else None
+
+
+# keys of UiObject.info
+INFO_KEYS = ("bounds", "childCount", "className", "contentDescription", "packageName", "resourceName", "text",
+             "visibleBounds", "checkable", "checked", "clickable", "enabled", "focusable", "focused",
+             "longClickable", "scrollable", "selected")
+
+
+def node_info(node) -> dict:
+    """
+    :param node: ElementTree node of the hierarchy, or lxml node of XMLElement whose tag is the class name
+    :return: info dict, same keys as UiObject.info
+    """
+    left, top, right, bottom = node_bounds(node)
+    bounds = {"left": left, "top": top, "right": right, "bottom": bottom}
+    info = {"bounds": bounds, "childCount": len(node), "className": node.get("class", node.tag),
+            "contentDescription": node.get("content-desc"), "packageName": node.get("package"),
+            "resourceName": node.get("resource-id"), "text": node.get("text"), "visibleBounds": dict(bounds)}
+    for key, attribute in LocatorIndex.BOOL_ATTRIBUTES.items():
+        info[key] = node.get(attribute) == "true"
+    return info
+
+
+def node_bounds(node) -> tuple:
+    """
+    :param node: ElementTree node of the hierarchy
+    :return: (left, top, right, bottom)
+    """
+    return tuple(int(value) for value in re.findall(r"-?\d+", node.get("bounds", "[0,0][0,0]")))
+
+
+def node_center(node) -> tuple:
+    """
+    :param node: ElementTree node of the hierarchy
+    :return: (x, y)
+    """
+    left, top, right, bottom = node_bounds(node)
+    return (left + right) // 2, (top + bottom) // 2
+
+
+def iter_page_text(source: str, class_names=None, packages=None, bounds=None, unique=False, description=True,
+                   chunk_size=65536):
+    """
+    Texts of the hierarchy in document order, the xml is parsed once by an incremental parser without building
+    element wrappers, so it is cheap enough to call on every screen of a long list
+    :param source: hierarchy xml
+    :param class_names: only nodes of these classes, default all
+    :param packages: only nodes of these packages, default all
+    :param bounds: (left, top, right, bottom), only nodes whose center is in this area, default all
+    :param unique: skip texts already yielded
+    :param description: also yield content-desc
+    :param chunk_size: characters fed to the parser at once
+    :return: generator of non empty texts
+    """
+    class_names = set(class_names) if class_names else None
+    packages = set(packages) if packages else None
+    attributes = ("text", "content-desc") if description else ("text",)
+    seen = set()
+    for node in _iter_nodes(source, chunk_size):
+        if class_names is not None and node.get("class") not in class_names:
+            continue
+        if packages is not None and node.get("package") not in packages:
+            continue
+        if bounds is not None:
+            x, y = node_center(node)
+            if not (bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]):
+                continue
+        for attribute in attributes:
+            text = node.get(attribute)
+            if not text or (unique and text in seen):
+                continue
+            if unique:
+                seen.add(text)
+            yield text
+
+
+def page_overlap(previous, current) -> int:
+    """
+    Number of items at the head of current repeating the tail of previous in the same order, the items a scroll
+    left on screen
+    :param previous: keys of the items of the previous page, in order
+    :param current: keys of the items of the new page, in order
+    :return: length of the longest tail of previous that is also the head of current
+    """
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def hierarchy_digest(source: str, exclude_packages=("com.android.systemui",), chunk_size=65536) -> str:
+    """
+    Digest of the content of the hierarchy, two snapshots showing the same screen have the same digest
+    :param source: hierarchy xml
+    :param exclude_packages: nodes of these packages are left out, default the status bar whose clock changes
+    :param chunk_size: characters fed to the parser at once
+    :return: hex digest
+    """
+    digest = hashlib.sha1()
+    for node in _iter_nodes(source, chunk_size):
+        if node.get("package") in exclude_packages:
+            continue
+        for attribute in ("class", "resource-id", "text", "content-desc", "bounds", "checked", "selected"):
+            digest.update(node.get(attribute, "").encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _iter_nodes(source, chunk_size=65536):
+    """
+    Nodes of the hierarchy xml in document order, parsed incrementally, only the attributes of a node are
+    available, children are dropped once parsed
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    for start in range(0, len(source), chunk_size):
+        parser.feed(source[start:start + chunk_size])
+        for event, node in parser.read_events():
+            if event == "end":
+                node.clear()
+            elif node.tag == "node":
+                yield node
+    parser.close()
+
+
+def invalidates_hierarchy(func):
+    """
+    Mark a keyword as screen changing, the hierarchy snapshot of the device is dropped after the keyword runs
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            if self.hierarchy is not None:
+                self.hierarchy.invalidate()
+
+    return wrapper
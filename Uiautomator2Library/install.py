@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+from .logger import logger
+
+_digests = {}
+_packages = {}
+_lock = threading.Lock()
+# package line of aapt/aapt2 dump badging
+BADGING_RE = re.compile(r"^package: name='(?P<package>[^']+)'", re.MULTILINE)
+
+
+def local_digest(path) -> str:
+    """
+    sha256 of a local file, kept while the file size and modification time do not change
+    :param path: file path
+    :return: hex digest
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _lock:
+        if key in _digests:
+            return _digests[key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def apk_package(path):
+    """
+    Package name of a local apk, read with the optional apkutils (pip install adbutils[apk]), or with aapt2, aapt
+    or apkanalyzer of the Android SDK found on PATH, kept while the file size and modification time do not change
+    :param path: apk file path
+    :return: package name, None if neither apkutils nor an SDK tool can read it
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _lock:
+        if key in _packages:
+            return _packages[key]
+    package = _apkutils_package(path) or _sdk_package(path)
+    if package is not None:
+        with _lock:
+            _packages[key] = package
+    return package
+
+
+def _apkutils_package(path):
+    try:
+        import apkutils
+    except ImportError:
+        return None
+    try:
+        with apkutils.APK.from_file(path) as apk:
+            return apk.package_name
+    except Exception as e:
+        logger.debug("package name of %s not read with apkutils: %r", path, e)
+        return None
+
+
+def _sdk_package(path):
+    commands = [[tool, "dump", "badging", path] for tool in ("aapt2", "aapt")]
+    commands.append(["apkanalyzer", "manifest", "application-id", path])
+    for command in commands:
+        executable = shutil.which(command[0])
+        if executable is None:
+            continue
+        try:
+            output = subprocess.run([executable] + command[1:], capture_output=True, text=True, timeout=60).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug("package name of %s not read with %s: %r", path, command[0], e)
+            continue
+        if command[0] == "apkanalyzer":
+            package = output.strip()
+        else:
+            match = BADGING_RE.search(output)
+            package = match.group("package") if match else ""
+        if package:
+            return package
+    return None
+
+
+def installed_digest(device, package, size):
+    """
+    sha256 of the base apk of the installed package, read with one shell call, the apk is only hashed on the device
+    when its size is the same as size
+    :param device: u2.Device
+    :param package: application package name
+    :param size: size of the local apk
+    :return: hex digest, None if the package is not installed or has another size
+    """
+    output, _ = device.shell(f'p=$(pm path {package} | head -n 1 | cut -d: -f2); '
+                             f'[ -n "$p" ] && [ "$(stat -c %s "$p")" = "{size}" ] && sha256sum "$p"')
+    digest = output.split()[0] if output.strip() else ""
+    return digest if len(digest) == 64 else None
+
+
+def install_apk(device, data, package=None, cache=True) -> bool:
+    """
+    Install the apk unless the device has the same build installed: the sha256 of the installed base apk is the
+    sha256 of the local apk, so version code and signing certificate are the same too
+    :param device: u2.Device
+    :param data: apk file path, url or file object, only a file path is looked up in the cache
+    :param package: application package name of the apk, default is read from the apk with apk_package, the
+        apk is installed without the cache when it cannot be read
+    :param cache: False installs the apk in any case
+    :return: False if the install was skipped
+    """
+    if cache and isinstance(data, str) and os.path.isfile(data):
+        package = package or apk_package(data)
+        if package is None:
+            logger.warning("package name of %s unknown, installing without cache, give the package or install "
+                           "apkutils or the Android SDK build tools", data)
+        elif installed_digest(device, package, os.path.getsize(data)) == local_digest(data):
+            logger.info("%s of %s is installed, skipping install", package, data)
+            return False
+    device.app_install(data)
+    return True
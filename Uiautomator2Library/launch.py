@@ -0,0 +1,89 @@
+# -*- coding:utf-8 -*-
+import re
+import threading
+from collections import defaultdict
+
+from .metrics import stats
+
+LAUNCH_MODES = ("cold", "warm", "hot")
+AM_START_RE = re.compile(r"^(?P<key>Status|LaunchState|Activity|TotalTime|WaitTime):\s*(?P<value>\S+)", re.MULTILINE)
+
+
+def launch_command(package, activity=None, mode="cold") -> str:
+    """
+    Shell command starting package with am start -W, the launcher activity is resolved on the device when activity
+    is None, so the command is one device call
+    :param package: application package name
+    :param activity: activity name, full or starting with a dot
+    :param mode: cold force stops the app first, hot goes to the home screen first so the app is brought back to
+        the front, warm starts it as it is
+    :return: shell command
+    """
+    if mode not in LAUNCH_MODES:
+        raise ValueError(f"Unknown launch mode '{mode}', use {', '.join(LAUNCH_MODES)}")
+    if activity:
+        component = f"{package}/{activity}"
+    else:
+        component = ("$(cmd package resolve-activity --brief -a android.intent.action.MAIN "
+                     f"-c android.intent.category.LAUNCHER {package} | tail -n 1)")
+    command = f"am start -W {'-S ' if mode == 'cold' else ''}-a android.intent.action.MAIN " \
+              f"-c android.intent.category.LAUNCHER -n {component}"
+    return f"input keyevent 3; {command}" if mode == "hot" else command
+
+
+def parse_am_start(output) -> dict:
+    """
+    :param output: output of am start -W
+    :return: {"status", "launch_state", "activity", "total_time", "wait_time"}, times in seconds, TotalTime is
+        the time from the intent to the first frame of the activity. Values the output does not have are None,
+        e.g. times when the activity was already in the front
+    """
+    values = {match.group("key"): match.group("value") for match in AM_START_RE.finditer(output or "")}
+
+    def seconds(key):
+        return int(values[key]) / 1000.0 if values.get(key, "").isdigit() else None
+
+    return {"status": values.get("Status"), "launch_state": values.get("LaunchState"),
+            "activity": values.get("Activity"), "total_time": seconds("TotalTime"), "wait_time": seconds("WaitTime")}
+
+
+class LaunchTimes(object):
+    """
+    Launch times of the apps started by the library, by package and launch state reported by Android
+    """
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, package, launch):
+        """
+        :param package: application package name
+        :param launch: dict of parse_am_start with ready_time
+        :return:
+        """
+        with self._lock:
+            self._samples[(package, launch.get("launch_state") or "UNKNOWN")].append(launch)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> dict:
+        """
+        :return: {package: {launch_state: {"count": n, "total_time": stats, "ready_time": stats}}},
+            stats is {"total", "p50", "p95", "max"} in seconds, None if no launch had the time
+        """
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+        summary = defaultdict(dict)
+        for (package, state), launches in sorted(samples.items()):
+            item = {"count": len(launches)}
+            for key in ("total_time", "ready_time"):
+                times = [launch[key] for launch in launches if launch.get(key) is not None]
+                item[key] = stats(times) if times else None
+            summary[package][state] = item
+        return dict(summary)
+
+
+launch_times = LaunchTimes()
@@ -0,0 +1,28 @@
+# -*- coding:utf-8 -*-
+import importlib
+import threading
+
+
+class LazyModule(object):
+    """
+    Stand-in for a module which is imported on the first attribute access,
+    so importing the library does not pay for heavy dependencies like uiautomator2
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<LazyModule {self._name!r} {'loaded' if self._module else 'not loaded'}>"
+
+
+u2 = LazyModule("uiautomator2")
@@ -0,0 +1,177 @@
+# -*- coding:utf-8 -*-
+import atexit
+import hashlib
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+from .logger import logger
+from .wait import wait_until
+
+
+class Lease(object):
+    """ A device leased from a DevicePool by this process """
+
+    def __init__(self, pool, serial, path, handle):
+        self.pool = pool
+        self.serial = serial
+        self.path = path
+        self.handle = handle
+        self.since = time.time()
+
+    def release(self):
+        self.pool.release(self)
+
+
+class DevicePool(object):
+    """
+    Devices shared by the workers of a test run (e.g. pabot processes), a device is leased by holding an exclusive
+    lock of the operating system on its lease file in a lock directory shared by the workers. The lock is released
+    by the operating system when a worker crashes, so leases of crashed workers are free again without any check
+    of the owner. Free devices are leased least used first so tests spread over the farm
+
+    Defaults come from environment variables:
+        U2LIB_DEVICE_POOL: comma separated serials or WiFi urls, or "adb" for every device adb lists
+        U2LIB_LEASE_DIR: lock directory, default u2lib-leases in the temp directory
+    """
+
+    def __init__(self, devices=None, lock_dir=None):
+        self._devices = devices
+        self.lock_dir = lock_dir or os.environ.get("U2LIB_LEASE_DIR") or os.path.join(tempfile.gettempdir(),
+                                                                                       "u2lib-leases")
+        self.host = socket.gethostname()
+        self._held = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.lock_dir, exist_ok=True)
+        atexit.register(self.release_all)
+
+    @classmethod
+    def from_env(cls):
+        """
+        :return: DevicePool of U2LIB_DEVICE_POOL, None if it is not set
+        """
+        devices = os.environ.get("U2LIB_DEVICE_POOL")
+        return cls(devices) if devices else None
+
+    @property
+    def devices(self) -> list:
+        """
+        :return: serials or urls of the pool, "adb" lists the devices adb sees at each call
+        """
+        devices = self._devices
+        if isinstance(devices, str):
+            if devices.strip() == "adb":
+                import adbutils
+                return [device.serial for device in adbutils.adb.device_list()]
+            devices = devices.split(",")
+        return [device.strip() for device in devices or [] if device.strip()]
+
+    def acquire(self, timeout=600.0) -> Lease:
+        """
+        Lease a free device, waiting for one to be released
+        :param timeout: max seconds to wait, raise TimeoutError after
+        :return: Lease
+        """
+        result = wait_until(self.try_acquire, timeout, interval=0.5, max_interval=5.0, description="free device")
+        if not result:
+            raise TimeoutError(f"No device of the pool {self.devices} was free after {timeout}s, "
+                               f"leases in {self.lock_dir}")
+        return result.value
+
+    def try_acquire(self):
+        """
+        :return: Lease of a free device, None if every device is leased
+        """
+        candidates = [serial for serial in self.devices if serial not in self._held]
+        random.shuffle(candidates)
+        candidates.sort(key=self._usage)
+        for serial in candidates:
+            path = self._path(serial, ".lease")
+            handle = _lock_file(path)
+            if handle is None:
+                continue
+            # the owner is written for people looking at the lock directory, the lock alone decides
+            handle.seek(0)
+            handle.truncate()
+            json.dump({"serial": serial, "pid": os.getpid(), "host": self.host, "time": time.time()}, handle)
+            handle.flush()
+            self._count(serial)
+            lease = Lease(self, serial, path, handle)
+            with self._lock:
+                self._held[serial] = lease
+            logger.info("leased device %s", serial)
+            return lease
+        return None
+
+    def release(self, lease):
+        """
+        :param lease: Lease returned by acquire
+        :return:
+        """
+        with self._lock:
+            if self._held.get(lease.serial) is not lease:
+                return
+            del self._held[lease.serial]
+        # the lease file is kept: removing it could remove the file another worker is locking right now
+        lease.handle.seek(0)
+        lease.handle.truncate()
+        _unlock_file(lease.handle)
+        logger.info("released device %s after %.1fs", lease.serial, time.time() - lease.since)
+
+    def release_all(self):
+        with self._lock:
+            leases = list(self._held.values())
+        for lease in leases:
+            lease.release()
+
+    def _path(self, serial, suffix) -> str:
+        return os.path.join(self.lock_dir, hashlib.sha1(serial.encode("utf-8")).hexdigest()[:16] + suffix)
+
+    def _usage(self, serial) -> int:
+        try:
+            with open(self._path(serial, ".count")) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _count(self, serial):
+        # only the lease holder writes the counter
+        count = self._usage(serial) + 1
+        with open(self._path(serial, ".count"), "w") as f:
+            f.write(str(count))
+
+
+def _lock_file(path):
+    """
+    Open path and lock it exclusively without blocking
+    :return: file object holding the lock, None if another process holds it
+    """
+    handle = os.fdopen(os.open(path, os.O_CREAT | os.O_RDWR, 0o644), "r+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _unlock_file(handle):
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
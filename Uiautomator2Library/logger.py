@@ -1,38 +1,125 @@
 # -*- coding:utf-8 -*-
+import atexit
 import logging
 import os
+import queue
+import threading
 import time
 from logging import handlers
 
 
 class Log(object):
-    def __init__(self):
-        logs_path = os.path.join(os.getcwd(), "logs")
-        if not os.path.exists(logs_path):
-            os.mkdir(logs_path)
-        name_format = time.strftime("%Y%m%d%H%M%S", time.localtime())
-        self._log_name = f"{logs_path}/{name_format}.log"
+    """
+    Library logger, the log file and console handlers are created on the first record,
+    with asynchronous records are written by a background thread through a queue
+
+    Defaults come from environment variables:
+        U2LIB_LOG_LEVEL: DEBUG, INFO, WARNING, ERROR, default DEBUG
+        U2LIB_LOG_DIR: directory of log files, empty string disables the log file, default ./logs
+        U2LIB_LOG_CONSOLE: 0 disables console output
+        U2LIB_LOG_ASYNC: 0 writes records in the logging thread
+    """
+
+    def __init__(self, level=None, log_dir=None, console=None, asynchronous=None):
+        self.level = (level or os.environ.get("U2LIB_LOG_LEVEL") or "DEBUG").upper()
+        if log_dir is None:
+            log_dir = os.environ.get("U2LIB_LOG_DIR", os.path.join(os.getcwd(), "logs"))
+        self.log_dir = log_dir
+        self.console = console if console is not None else os.environ.get("U2LIB_LOG_CONSOLE", "1") != "0"
+        self.asynchronous = asynchronous if asynchronous is not None else os.environ.get("U2LIB_LOG_ASYNC", "1") != "0"
+        self._handlers = None
+        self._listener = None
+        self._lock = threading.Lock()
 
     def set_logger(self):
-        # 创建一个logger,可以考虑如何将它封装
-        loggers = logging.getLogger(self._log_name)
-        loggers.setLevel(logging.DEBUG)
-        # 创建一个handler，用于写入日志文件, 存 3 个日志，每个 10M 大小
-        fh = handlers.RotatingFileHandler(self._log_name, maxBytes=10 * 1024 * 1024, backupCount=3,
-                                          encoding="UTF-8")
-        fh.setLevel(logging.DEBUG)
-        # 再创建一个handler，用于输出到控制台
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.DEBUG)
+        # 创建一个logger, handler 在第一条日志时才创建
+        loggers = logging.getLogger("Uiautomator2Library")
+        loggers.setLevel(self.level)
+        for handler in list(loggers.handlers):
+            if isinstance(handler, _LazyHandler):
+                handler.log.close()
+                loggers.removeHandler(handler)
+        loggers.addHandler(_LazyHandler(self))
+        return loggers
+
+    def handlers(self) -> list:
+        """
+        Handlers records are passed to, created on the first call
+        :return: list of logging.Handler
+        """
+        with self._lock:
+            if self._handlers is None:
+                self._handlers = self._open()
+            return self._handlers
+
+    def _open(self) -> list:
         # 定义handler的输出格式
         formatter = logging.Formatter('%(asctime)s - %(module)s.%(funcName)s.%(lineno)d - '
                                       '%(levelname)s - %(message)s')
-        fh.setFormatter(formatter)
-        ch.setFormatter(formatter)
-        # 给logger添加handler
-        loggers.addHandler(fh)
-        loggers.addHandler(ch)
-        return loggers
+        targets = []
+        if self.log_dir:
+            if not os.path.exists(self.log_dir):
+                os.makedirs(self.log_dir)
+            name_format = time.strftime("%Y%m%d%H%M%S", time.localtime())
+            # 创建一个handler，用于写入日志文件, 存 3 个日志，每个 10M 大小
+            targets.append(handlers.RotatingFileHandler(os.path.join(self.log_dir, f"{name_format}.log"),
+                                                        maxBytes=10 * 1024 * 1024, backupCount=3, encoding="UTF-8"))
+        if self.console:
+            # 再创建一个handler，用于输出到控制台
+            targets.append(logging.StreamHandler())
+        for handler in targets:
+            handler.setLevel(self.level)
+            handler.setFormatter(formatter)
+        if not self.asynchronous:
+            return targets
+        records = queue.SimpleQueue()
+        self._listener = handlers.QueueListener(records, *targets, respect_handler_level=True)
+        self._listener.start()
+        return [handlers.QueueHandler(records)]
+
+    def close(self):
+        """
+        Write the queued records and close the handlers
+        :return:
+        """
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+                self._listener = None
+            for handler in self._handlers or []:
+                handler.close()
+            self._handlers = None
+
+
+class _LazyHandler(logging.Handler):
+    """ Passes records to the handlers of Log, which are created on the first record """
+
+    def __init__(self, log: Log):
+        super(_LazyHandler, self).__init__()
+        self.log = log
+
+    def emit(self, record):
+        for handler in self.log.handlers():
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def configure_logger(level=None, log_dir=None, console=None, asynchronous=None):
+    """
+    Replace the handlers of the library logger, arguments left None use the environment variable defaults
+    :param level: DEBUG, INFO, WARNING, ERROR
+    :param log_dir: directory of log files, empty string disables the log file
+    :param console: False disables console output
+    :param asynchronous: False writes records in the logging thread
+    :return: logger
+    """
+    global _log
+    _log = Log(level, log_dir, console, asynchronous)
+    return _log.set_logger()
 
 
-logger = Log().set_logger()
+_log = Log()
+logger = _log.set_logger()
+atexit.register(lambda: _log.close())
@@ -0,0 +1,220 @@
+# -*- coding:utf-8 -*-
+import contextlib
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+
+class KeywordMetrics(object):
+    """
+    Wall time, device HTTP calls and wait time of every keyword call,
+    nested keyword calls are counted in the outermost keyword
+    """
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _frame(self):
+        return getattr(self._local, "frame", None)
+
+    def start(self, name) -> bool:
+        """
+        Start measuring keyword in the current thread
+        :param name: keyword name
+        :return: False if another keyword is already measured in this thread
+        """
+        if self._frame() is not None:
+            return False
+        self._local.frame = {"name": name, "start": time.perf_counter(), "rpc": 0, "wait": 0.0}
+        return True
+
+    def stop(self, record=True) -> tuple:
+        """
+        Stop measuring the keyword measured in the current thread
+        :param record: False returns the sample without recording it
+        :return: (wall, rpc, wait) sample
+        """
+        frame = self._frame()
+        self._local.frame = None
+        sample = (time.perf_counter() - frame["start"], frame["rpc"], frame["wait"])
+        if record:
+            self.record(frame["name"], sample)
+        return sample
+
+    def record(self, name, sample):
+        """
+        :param name: keyword name
+        :param sample: (wall, rpc, wait) of one keyword call
+        """
+        with self._lock:
+            self._samples[name].append(sample)
+
+    def count_rpc(self, *args, **kwargs):
+        """ requests response hook, counts the HTTP call in the keyword measured in the current thread """
+        frame = self._frame()
+        if frame is not None:
+            frame["rpc"] += 1
+
+    def add_wait(self, seconds):
+        """
+        :param seconds: time the keyword measured in the current thread spent waiting
+        """
+        frame = self._frame()
+        if frame is not None:
+            frame["wait"] += seconds
+
+    @contextlib.contextmanager
+    def waiting(self):
+        """
+        Count the time of the block as wait time of the keyword measured in the current thread, for waits done by
+        the uiautomator2 server or client (wait(timeout=), click_exists(timeout=), wait_activity), the round trip of
+        the call is counted too as it can not be told apart from the wait
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_wait(time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> dict:
+        """
+        :return: {keyword: {"count": n, "wall": stats, "execute": stats, "wait": stats, "rpc": stats}},
+            stats is {"total", "p50", "p95", "max"}, execute is wall time minus wait time
+        """
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        summary = {}
+        for name, values in sorted(samples.items()):
+            walls = [wall for wall, _, _ in values]
+            waits = [wait for _, _, wait in values]
+            summary[name] = {
+                "count": len(values),
+                "wall": stats(walls),
+                "execute": stats([wall - wait for wall, wait in zip(walls, waits)]),
+                "wait": stats(waits),
+                "rpc": stats([rpc for _, rpc, _ in values]),
+            }
+        return summary
+
+    def dump(self, path):
+        """
+        Write summary to json file
+        :param path: file path
+        :return:
+        """
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def html(self) -> str:
+        """
+        :return: summary as html table, slowest keyword first
+        """
+        rows = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in self._rows())
+        header = "".join(f"<th>{cell}</th>" for cell in self.COLUMNS)
+        return f"<table border='1'><tr>{header}</tr>{rows}</table>"
+
+    def table(self) -> str:
+        """
+        :return: summary as Robot Framework documentation table, slowest keyword first
+        """
+        lines = ["| " + " | ".join(f"*{cell}*" for cell in self.COLUMNS) + " |"]
+        lines += ["| " + " | ".join(row) + " |" for row in self._rows()]
+        return "\n".join(lines)
+
+    COLUMNS = ("keyword", "count", "total s", "p50 s", "p95 s", "max s", "wait s", "rpc", "p95 rpc")
+
+    def _rows(self) -> list:
+        summary = self.summary()
+        rows = []
+        for name in sorted(summary, key=lambda keyword: summary[keyword]["wall"]["total"], reverse=True):
+            item = summary[name]
+            wall = item["wall"]
+            rows.append([name, str(item["count"]), f"{wall['total']:.3f}", f"{wall['p50']:.3f}", f"{wall['p95']:.3f}",
+                         f"{wall['max']:.3f}", f"{item['wait']['total']:.3f}", f"{item['rpc']['total']:.0f}",
+                         f"{item['rpc']['p95']:.0f}"])
+        return rows
+
+
+def stats(values) -> dict:
+    """
+    :param values: list of numbers, not empty
+    :return: {"total", "p50", "p95", "max"} of values
+    """
+    ordered = sorted(values)
+
+    def percentile(percent):
+        return ordered[max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)]
+
+    return {"total": sum(ordered), "p50": percentile(50), "p95": percentile(95), "max": ordered[-1]}
+
+
+metrics = KeywordMetrics()
+
+
+def measured(func):
+    """
+    Record wall time, device HTTP calls and wait time of the keyword in metrics, a generator keyword is measured
+    while it computes its items, the time the caller spends between two items is left out, and recorded as one
+    call when it is exhausted or closed
+    """
+    if inspect.isgeneratorfunction(func):
+        return _measured_generator(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = metrics.start(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if started:
+                metrics.stop()
+
+    return wrapper
+
+
+def _measured_generator(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        iterator = func(*args, **kwargs)
+        steps = []
+        try:
+            while True:
+                started = metrics.start(func.__name__)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    if started:
+                        steps.append(metrics.stop(record=False))
+                yield item
+        finally:
+            iterator.close()
+            if steps:
+                metrics.record(func.__name__, tuple(sum(values) for values in zip(*steps)))
+
+    return wrapper
+
+
+def instrumented(cls):
+    """
+    Class decorator measuring every public keyword defined in the class
+    """
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_"):
+            continue
+        if isinstance(member, staticmethod):
+            setattr(cls, name, staticmethod(measured(member.__func__)))
+        elif callable(member):
+            setattr(cls, name, measured(member))
+    return cls
@@ -0,0 +1,193 @@
+# -*- coding:utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+from .health import HealthMonitor
+from .hierarchy import HierarchyCache
+from .metrics import metrics
+from .screenshot import ScreenshotPipeline
+from .toast import ToastWatcher
+from .transport import add_response_hook, configure_pool, move_response_hooks, remove_response_hook
+
+
+class DeviceContext(object):
+    """
+    Connection state of one device: the u2.Device and the caches built on it
+    """
+
+    def __init__(self, alias, serial_url, device):
+        self.alias = alias
+        self.serial_url = serial_url
+        self.device = device
+        self.hierarchy = HierarchyCache(device)
+        self.screenshots = ScreenshotPipeline()
+        self.recorder = None
+        self.health = None
+        self.lease = None
+        self.coordinates = None
+        self.toasts = None
+        configure_pool(device)
+        add_response_hook(device, metrics.count_rpc)
+
+    def check(self):
+        """
+        Fail fast: raise ConnectionError if the health monitor knows the device is gone
+        :return:
+        """
+        health = self.health
+        if health is not None and health.fail_fast and not health.alive:
+            raise ConnectionError(f"Device '{self.alias}' is not reachable since "
+                                  f"{time.strftime('%H:%M:%S', time.localtime(health.lost_since))}, "
+                                  f"{health.failures} failed probes")
+
+    def rebind(self, device):
+        """
+        Replace the u2.Device after a reconnect, response hooks are moved to the new device
+        :param device: u2.Device
+        :return:
+        """
+        configure_pool(device)
+        move_response_hooks(self.device, device)
+        self.hierarchy = HierarchyCache(device)
+        self.device = device
+
+    def start_health_monitor(self, interval=5.0, fail_fast=True, reconnect=True) -> HealthMonitor:
+        """
+        Probe the device in background, see HealthMonitor
+        :param interval: seconds between probes
+        :param fail_fast: keywords raise ConnectionError at once while the device is gone
+        :param reconnect: connect again with backoff when the probe fails
+        :return: HealthMonitor
+        """
+        self.stop_health_monitor()
+        self.health = HealthMonitor(self, interval, fail_fast, reconnect)
+        self.health.start()
+        return self.health
+
+    def stop_health_monitor(self):
+        health, self.health = self.health, None
+        if health is not None:
+            health.stop()
+
+    def start_toast_watcher(self, interval=0.5, size=100) -> ToastWatcher:
+        """
+        Collect the toasts of the device in background, see ToastWatcher
+        :param interval: seconds between polls
+        :param size: toasts kept in the buffer
+        :return: ToastWatcher
+        """
+        self.stop_toast_watcher()
+        self.toasts = ToastWatcher(self, interval, size)
+        self.toasts.start()
+        return self.toasts
+
+    def stop_toast_watcher(self):
+        toasts, self.toasts = self.toasts, None
+        if toasts is not None:
+            toasts.stop()
+        return toasts
+
+    def stop_recording(self) -> int:
+        """
+        Stop the trace recording of the device
+        :return: number of exchanges recorded, 0 if the device is not recorded
+        """
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return 0
+        remove_response_hook(self.device, recorder.hook)
+        return recorder.close()
+
+    def close(self):
+        """
+        Finish the background work of the device
+        :return:
+        """
+        self.stop_health_monitor()
+        self.stop_toast_watcher()
+        self.stop_recording()
+        self.screenshots.close()
+        if self.lease is not None:
+            self.lease.release()
+            self.lease = None
+
+
+class DeviceRegistry(object):
+    """
+    Connected devices by alias, one of them is the current device used by keywords
+    """
+
+    def __init__(self):
+        self._contexts = OrderedDict()
+        self._current = None
+        self._lock = threading.RLock()
+
+    def __contains__(self, alias):
+        return alias in self._contexts
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._contexts.values()))
+
+    def __len__(self):
+        return len(self._contexts)
+
+    @property
+    def aliases(self) -> list:
+        return list(self._contexts)
+
+    @property
+    def current(self):
+        """
+        :return: DeviceContext of the current device, None if no device is connected
+        """
+        return self._current
+
+    def get(self, alias) -> DeviceContext:
+        """
+        :param alias: device alias
+        :return: DeviceContext, raise ValueError if alias is not connected
+        """
+        with self._lock:
+            if alias not in self._contexts:
+                raise ValueError(f"No device is connected with alias '{alias}', connected: {self.aliases}")
+            return self._contexts[alias]
+
+    def register(self, alias, serial_url, device) -> DeviceContext:
+        """
+        Add device and make it the current device
+        :param alias: device alias
+        :param serial_url: device serial or WiFi url used to connect
+        :param device: u2.Device
+        :return: DeviceContext
+        """
+        with self._lock:
+            context = DeviceContext(alias, serial_url, device)
+            self._contexts[alias] = context
+            self._current = context
+            return context
+
+    def switch(self, alias):
+        """
+        Make alias the current device
+        :param alias: device alias
+        :return: alias of the previous current device
+        """
+        with self._lock:
+            previous = self._current.alias if self._current else None
+            self._current = self.get(alias)
+            return previous
+
+    def remove(self, alias) -> DeviceContext:
+        """
+        Remove device, there is no current device if it was the current one
+        :param alias: device alias
+        :return: removed DeviceContext
+        """
+        with self._lock:
+            context = self.get(alias)
+            del self._contexts[alias]
+            if self._current is context:
+                self._current = None
+            return context
@@ -0,0 +1,162 @@
+# -*- coding:utf-8 -*-
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def image_fingerprint(data, size=16) -> str:
+    """
+    Hash of a downscaled grayscale screenshot, small changes of color and the status bar are ignored
+    :param data: JPEG or PNG bytes
+    :param size: side of the downscaled image
+    :return: hex digest
+    """
+    from PIL import Image
+    image = Image.open(io.BytesIO(data)).convert("L")
+    width, height = image.size
+    # the status bar clock and icons change while the app is still
+    image = image.crop((0, height // 20, width, height)).resize((size, size))
+    return hashlib.md5(bytes(value >> 4 for value in image.getdata())).hexdigest()
+
+
+class Frame(object):
+    """ One captured screenshot: the JPEG bytes sent by the device """
+
+    def __init__(self, data, digest):
+        self.timestamp = time.time()
+        self.data = data
+        self.digest = digest
+
+
+class ScreenshotPipeline(object):
+    """
+    Screenshots are captured on the keyword thread and encoded and written by a background worker pool,
+    the last frames are kept in a ring buffer which can be written to disk later, e.g. when a test fails
+    """
+    FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "raw": (None, ".jpg")}
+
+    def __init__(self, image_format="png", quality=90, buffer_size=10, workers=2):
+        self.asynchronous = False
+        self._executor = None
+        self._pending = []
+        self._buffer = deque(maxlen=buffer_size)
+        self._last = None
+        self._lock = threading.Lock()
+        self.configure(image_format, quality, buffer_size, workers)
+
+    def configure(self, image_format="png", quality=90, buffer_size=10, workers=2):
+        """
+        :param image_format: png, jpeg or raw, raw writes the JPEG bytes sent by the device without encoding
+        :param quality: jpeg quality 1-95
+        :param buffer_size: number of frames kept in memory
+        :param workers: number of encoding threads
+        :return:
+        """
+        assert image_format in self.FORMATS
+        self.image_format = image_format
+        self.quality = int(quality)
+        if self._executor is not None and self.workers != int(workers):
+            self.close()
+        self.workers = int(workers)
+        with self._lock:
+            if self._buffer.maxlen != int(buffer_size):
+                self._buffer = deque(self._buffer, maxlen=int(buffer_size))
+
+    def capture(self, device, filename=None):
+        """
+        Take screenshot into the ring buffer, a frame identical to the previous one is not stored again
+        but is still written to filename
+        :param device: u2.Device
+        :param filename: file to write the frame to in background, the extension follows the format
+        :return: file path, None without filename
+        """
+        data = device.screenshot(format="raw")
+        digest = hashlib.md5(data).hexdigest()
+        with self._lock:
+            if self._last is not None and self._last.digest == digest:
+                frame = self._last
+            else:
+                frame = Frame(data, digest)
+                self._buffer.append(frame)
+                self._last = frame
+        if filename:
+            return self._submit(frame, filename)
+        return None
+
+    def flush(self, directory, prefix="screenshot") -> list:
+        """
+        Write the frames in the ring buffer to directory and empty the buffer
+        :param directory: output directory
+        :param prefix: file name prefix
+        :return: list of file paths
+        """
+        with self._lock:
+            frames = list(self._buffer)
+            self._buffer.clear()
+        paths = []
+        for frame in frames:
+            stamp = time.strftime("%Y%m%d%H%M%S", time.localtime(frame.timestamp))
+            millis = int(frame.timestamp * 1000) % 1000
+            paths.append(self._submit(frame, os.path.join(directory, f"{prefix}-{stamp}{millis:03d}")))
+        self.wait()
+        return paths
+
+    def clear(self):
+        """
+        Drop the frames in the ring buffer
+        :return:
+        """
+        with self._lock:
+            self._buffer.clear()
+
+    def wait(self):
+        """
+        Wait all background writes, raise the first write error
+        :return:
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _submit(self, frame, filename) -> str:
+        """
+        Write frame to filename in background
+        :return: file path with the extension of the format
+        """
+        pil_format, extension = self.FORMATS[self.image_format]
+        if os.path.splitext(filename)[1].lower() not in (extension, ".jpeg" if extension == ".jpg" else extension):
+            filename += extension
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="u2-screenshot")
+            # finished writes are dropped, failed ones are kept for wait to raise
+            self._pending = [future for future in self._pending if not future.done() or future.exception()]
+            self._pending.append(self._executor.submit(self._write, frame.data, filename, pil_format, self.quality))
+        return filename
+
+    @staticmethod
+    def _write(data, filename, pil_format, quality):
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        if pil_format is None:
+            with open(filename, "wb") as f:
+                f.write(data)
+            return
+        from PIL import Image
+        image = Image.open(io.BytesIO(data))
+        if pil_format == "JPEG":
+            image.convert("RGB").save(filename, pil_format, quality=quality)
+        else:
+            image.save(filename, pil_format)
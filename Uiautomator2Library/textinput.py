@@ -0,0 +1,73 @@
+# -*- coding:utf-8 -*-
+import base64
+
+from .batch import JsonRpcBatch
+from .lazy import u2
+from .logger import logger
+from .metrics import metrics
+
+TEXT_INPUT_MODES = ("set_text", "auto", "clipboard", "ime")
+FAST_IME = "com.github.uiautomator/.FastInputIME"
+KEYCODE_PASTE = 279
+
+
+def chunks(text, size) -> list:
+    return [text[position:position + size] for position in range(0, len(text), size)] or [""]
+
+
+def input_ime(device, text, chunk_size=16000):
+    """
+    Replace the text of the focused element through the FastInputIME broadcasts, one shell call per chunk,
+    the first chunk replaces the text and the next ones are appended
+    :param device: u2.Device, FastInputIME must be the current input method
+    :param text: text
+    :param chunk_size: characters per broadcast, base64 of a chunk must fit in one shell argument
+    :return:
+    """
+    for position, chunk in enumerate(chunks(text, chunk_size)):
+        action = "ADB_SET_TEXT" if position == 0 else "ADB_INPUT_TEXT"
+        encoded = base64.b64encode(chunk.encode("utf-8")).decode("ascii")
+        device.shell(["am", "broadcast", "-a", action, "--es", "text", encoded])
+
+
+def input_clipboard(device, text):
+    """
+    Replace the text of the focused element by pasting text, the field is cleared, the whole text is set to the
+    clipboard and pasted once in one JSON-RPC batch, so no later clipboard write can replace it before the paste
+    :param device: u2.Device
+    :param text: text
+    :return:
+    """
+    batch = JsonRpcBatch(device)
+    batch.add("clearTextField", u2.Selector(focused=True))
+    batch.add("setClipboard", None, text)
+    batch.add("pressKeyCode", KEYCODE_PASTE)
+    batch.send()
+
+
+def input_bulk(device, text, mode="auto", chunk_size=16000) -> str:
+    """
+    Replace the text of the focused element by the fastest path of mode: auto uses the FastInputIME broadcasts
+    when FastInputIME is the current input method and the clipboard otherwise, ime switches to FastInputIME first
+    :param device: u2.Device
+    :param text: text
+    :param mode: auto, ime, clipboard or set_text
+    :param chunk_size: characters per FastInputIME broadcast
+    :return: mode used
+    """
+    if mode not in TEXT_INPUT_MODES:
+        raise ValueError(f"Unknown text input mode '{mode}', use {', '.join(TEXT_INPUT_MODES)}")
+    if mode == "auto":
+        mode = "ime" if device.current_ime()[0] == FAST_IME else "clipboard"
+    elif mode == "ime" and device.current_ime()[0] != FAST_IME:
+        device.set_fastinput_ime(True)
+        with metrics.waiting():
+            device.wait_fastinput_ime()
+    logger.debug("input %d characters with %s", len(text), mode)
+    if mode == "ime":
+        input_ime(device, text, chunk_size)
+    elif mode == "clipboard":
+        input_clipboard(device, text)
+    else:
+        device(focused=True).set_text(text)
+    return mode
@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+import json
+import threading
+import time
+from collections import deque
+
+from .logger import logger
+
+
+class ToastWatcher(object):
+    """
+    Background collector of the toasts of one device: the last toast is read every interval on a session of its own
+    and cleared on the device, so each toast is collected once. Toasts are kept with the time they were seen in a
+    ring buffer of size entries, checks read the buffer instead of racing the short life of a toast
+    """
+
+    def __init__(self, context, interval=0.5, size=100, request_timeout=2.0):
+        self.context = context
+        self.interval = interval
+        self.request_timeout = request_timeout
+        self.started = time.time()
+        self.errors = 0
+        self._toasts = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._session = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"u2-toast-{context.alias}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(self.request_timeout + 1)
+        if self._session is not None:
+            self._session.close()
+
+    def toasts(self, since=None) -> list:
+        """
+        :param since: epoch seconds, None for every toast in the buffer
+        :return: (time, message) tuples seen at or after since, oldest first
+        """
+        with self._lock:
+            toasts = list(self._toasts)
+        return [toast for toast in toasts if since is None or toast[0] >= since]
+
+    def find(self, message, since=None, exact=False):
+        """
+        :param message: text of the toast, a part of it unless exact
+        :param since: epoch seconds
+        :param exact: the whole toast must be message
+        :return: (time, message) of the first matching toast, None if no toast matches
+        """
+        for toast in self.toasts(since):
+            if toast[1] == message or (not exact and message in toast[1]):
+                return toast
+        return None
+
+    def _call(self, method, *params):
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        res = self._session.post(self.context.device.path2url("/jsonrpc/0"), timeout=self.request_timeout,
+                                 data=json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}))
+        return res.json().get("result")
+
+    def _run(self):
+        # a toast shown between two polls is still cached by the uiautomator2 server
+        cache_ms = int(max(self.interval * 4, 2.0) * 1000)
+        while not self._stop.wait(self.interval):
+            try:
+                message = self._call("getLastToast", cache_ms)
+                if message:
+                    self._call("clearLastToast")
+                    with self._lock:
+                        self._toasts.append((time.time(), message))
+                    logger.debug("toast on %s: %s", self.context.alias, message)
+            except Exception as e:
+                self.errors += 1
+                logger.debug("toast poll of %s failed: %r", self.context.alias, e)
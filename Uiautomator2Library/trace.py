@@ -0,0 +1,232 @@
+# -*- coding:utf-8 -*-
+import base64
+import gzip
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .logger import logger
+
+TEXT_TYPES = ("json", "text", "xml")
+
+
+def exchange_key(method, path, body) -> str:
+    """
+    Key an exchange is replayed by: HTTP method, path and the JSON-RPC method and params of the body,
+    the JSON-RPC id is left out as it changes on every call
+    :param method: HTTP method
+    :param path: url path
+    :param body: request body, str, bytes or None
+    :return: key string
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    body = body or ""
+    try:
+        calls = json.loads(body)
+    except ValueError:
+        return f"{method} {path} {body}"
+    if isinstance(calls, dict) and "method" in calls:
+        body = json.dumps([calls.get("method"), calls.get("params")], sort_keys=True)
+    elif isinstance(calls, list):
+        body = json.dumps([[call.get("method"), call.get("params")] for call in calls if isinstance(call, dict)],
+                          sort_keys=True)
+    return f"{method} {path} {body}"
+
+
+def rpc_method(body) -> str or None:
+    """
+    :param body: request body
+    :return: JSON-RPC method of the body, methods joined by comma for a batch, None if body is not JSON-RPC
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        calls = json.loads(body or "")
+    except ValueError:
+        return None
+    if isinstance(calls, dict):
+        return calls.get("method")
+    if isinstance(calls, list):
+        return ",".join(str(call.get("method")) for call in calls if isinstance(call, dict))
+    return None
+
+
+class TraceRecorder(object):
+    """
+    Writes every HTTP/JSON-RPC exchange of a device to a gzip json lines trace, hierarchy xml and screenshots
+    are recorded as they are answers of the device, binary bodies are base64 encoded
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def hook(self, response, *args, **kwargs):
+        """ response hook of requests.Session """
+        request = response.request
+        url = urlsplit(request.url)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        content_type = response.headers.get("Content-Type", "")
+        record = {"method": request.method, "path": path, "key": exchange_key(request.method, path, request.body),
+                  "rpc": rpc_method(request.body), "status": response.status_code, "content_type": content_type,
+                  "elapsed": response.elapsed.total_seconds()}
+        if any(text_type in content_type for text_type in TEXT_TYPES):
+            record["body"] = response.text
+        else:
+            record["body64"] = base64.b64encode(response.content).decode("ascii")
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self) -> int:
+        """
+        :return: number of exchanges recorded
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            return self.count
+
+
+class Trace(object):
+    """
+    Recorded exchanges by key, the answers of a key are replayed in the recorded order, the last one is repeated
+    when the keywords ask more often than during the recording, e.g. when a wait polls longer
+    """
+
+    def __init__(self, path):
+        self._exchanges = defaultdict(list)
+        self._by_rpc = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._exchanges[record["key"]].append(record)
+                    self._by_rpc[(record["method"], record["path"], record["rpc"])].append(record)
+
+    def __len__(self):
+        return sum(len(records) for records in self._exchanges.values())
+
+    def answer(self, method, path, body, fuzzy=False):
+        """
+        :param fuzzy: answer a request without an exchange of the same key with the same JSON-RPC method
+            recorded with other params
+        :return: (record, exact), record is None if nothing was recorded for the request, exact is False for
+            a fuzzy answer
+        """
+        key = exchange_key(method, path, body)
+        records = self._exchanges.get(key)
+        exact = bool(records)
+        if not exact:
+            if not fuzzy:
+                return None, False
+            key = (method, path, rpc_method(body))
+            records = self._by_rpc.get(key)
+            if not records:
+                return None, False
+        with self._lock:
+            position = self._served[key]
+            self._served[key] += 1
+        return records[min(position, len(records) - 1)], exact
+
+
+class ReplayServer(object):
+    """
+    Local stand-in of the uiautomator2 server answering from a trace, connect the library to url. misses counts
+    the requests without an exchange of the same key, fuzzy answers included
+    """
+
+    def __init__(self, path, host="127.0.0.1", port=0, latency=0, fuzzy=False):
+        self.trace = Trace(path)
+        self.latency = latency
+        self.fuzzy = fuzzy
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, int(port)), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="u2-replay", daemon=True)
+        self.misses = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def start(self) -> str:
+        self._thread.start()
+        logger.info("replay server of %d exchanges on %s", len(self.trace), self.url)
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _handler(replay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _answer(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            record, exact = replay.trace.answer(self.command, self.path, body, replay.fuzzy)
+            if not exact:
+                replay.miss()
+                logger.warning("replay has no exchange for %s %s %s%s", self.command, self.path, body[:200],
+                               ", answered with other params" if record is not None else "")
+            if record is None:
+                payload, status, content_type = b"not recorded", 404, "text/plain"
+            else:
+                status, content_type = record["status"], record["content_type"]
+                if "body" in record:
+                    payload = _with_request_ids(record["body"], body).encode("utf-8")
+                else:
+                    payload = base64.b64decode(record["body64"])
+            if replay.latency:
+                threading.Event().wait(replay.latency)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _answer
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _with_request_ids(answer, body) -> str:
+    """
+    Replace the JSON-RPC ids of the recorded answer by the ids of the request being answered
+    """
+    try:
+        calls, result = json.loads(body or b""), json.loads(answer)
+    except ValueError:
+        return answer
+    if isinstance(calls, dict) and isinstance(result, dict) and "id" in calls:
+        result["id"] = calls["id"]
+    elif isinstance(calls, list) and isinstance(result, list) and len(calls) == len(result):
+        for call, item in zip(calls, result):
+            if isinstance(call, dict) and isinstance(item, dict):
+                item["id"] = call.get("id")
+    else:
+        return answer
+    return json.dumps(result, ensure_ascii=False)
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+
+
+def http_session(device):
+    """
+    :param device: u2.Device
+    :return: requests.Session the device sends its HTTP/JSON-RPC requests with
+    """
+    return device.http
+
+
+def add_response_hook(device, hook):
+    """
+    Call hook with every HTTP response the device receives
+    :param device: u2.Device
+    :param hook: callable with requests.Response argument
+    :return:
+    """
+    hooks = http_session(device).hooks.setdefault("response", [])
+    if hook not in hooks:
+        hooks.append(hook)
+
+
+def remove_response_hook(device, hook):
+    """
+    :param device: u2.Device
+    :param hook: hook given to add_response_hook
+    :return:
+    """
+    hooks = http_session(device).hooks.get("response", [])
+    if hook in hooks:
+        hooks.remove(hook)
+
+
+def configure_pool(device, pool_maxsize=8, connect_retries=2):
+    """
+    Mount a keep-alive connection pool on the device session, connections are reused by the keyword thread and
+    the background workers, requests which could not connect are retried, requests already sent are not
+    :param device: u2.Device
+    :param pool_maxsize: max idle connections kept open
+    :param connect_retries: retries of a failed connect, with backoff
+    :return:
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retries = Retry(total=connect_retries, connect=connect_retries, read=0, status=0, other=0, redirect=0,
+                    backoff_factor=0.2, raise_on_redirect=False)
+    session = http_session(device)
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=retries))
+
+
+def move_response_hooks(source, target):
+    """
+    Add the response hooks of source device to target device
+    :param source: u2.Device
+    :param target: u2.Device
+    :return:
+    """
+    for hook in list(http_session(source).hooks.get("response", [])):
+        add_response_hook(target, hook)
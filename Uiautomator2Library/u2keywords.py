@@ -1,28 +1,99 @@
 # -*- coding:utf-8 -*-
-import threading
-
-import uiautomator2 as u2
-from time import sleep
-
-
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .batch import JsonRpcBatch
+from .coords import CoordinateCache
+from .hierarchy import INFO_KEYS, LocatorIndex, hierarchy_digest, invalidates_hierarchy, iter_page_text, node_center, \
+    node_info, page_overlap
+from .install import install_apk, local_digest
+from .launch import launch_command, launch_times, parse_am_start
+from .lazy import u2
+from .lease import DevicePool
+from .logger import configure_logger, logger
+from .metrics import instrumented, metrics
+from .registry import DeviceRegistry
+from .screenshot import image_fingerprint
+from .textinput import TEXT_INPUT_MODES, input_bulk
+from .trace import ReplayServer, TraceRecorder
+from .transport import add_response_hook
+from .wait import wait_until
+
+
+def stabilizes_screen(func):
+    """
+    Mark a keyword as a click, with Set Click Stabilization the keyword returns when the screen is stable
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        result = func(self, *args, **kwargs)
+        if Actions._stabilization is not None and self._registry.current is not None:
+            stable, elapsed = self._wait_screen_stable(**Actions._stabilization)
+            if not stable:
+                logger.warning("screen not stable %.1fs after %s", elapsed, func.__name__)
+        return result
+
+    return wrapper
+
+
+@instrumented
 class Actions:
-    _instance_lock = threading.Lock()
+    # shared by all keyword classes, so UiActions/DeviceActions/XpathActions created separately drive the same devices
+    _registry = DeviceRegistry()
+    _replay = None
+    # Wait Until Screen Stable arguments used after clicks, see Set Click Stabilization
+    _stabilization = None
+    # bulk text input settings of Set Text Input Mode, None sets every text with set_text
+    _text_input = None
+    # DevicePool of Configure Device Pool, or of U2LIB_DEVICE_POOL read on the first Connect Device
+    _pool = None
 
     def __init__(self):
-        self.device = None
+        pass
+
+    @property
+    def device(self):
+        """
+        u2.Device of the current device, None if no device is connected,
+        raise ConnectionError in fail fast mode if the device is known to be gone
+        """
+        context = self._registry.current
+        if context is None:
+            return None
+        context.check()
+        return context.device
 
-    def __new__(cls):
-        if not hasattr(Actions, "_instance"):
-            with Actions._instance_lock:
-                if not hasattr(Actions, "_instance"):
-                    Actions._instance = object.__new__(cls)
-        return Actions._instance
+    @property
+    def hierarchy(self):
+        """ HierarchyCache of the current device, None if no device is connected """
+        context = self._registry.current
+        return context.hierarchy if context else None
 
-    def connect_device(self, serial_url=None):
+    def _connected(self):
         """
-        Connect to phone device
-        :param serial_url: device serial or WiFi url, default connect by usb
-        :return:
+        :return: DeviceContext of the current device, raise ConnectionError if no device is connected
+        """
+        context = self._registry.current
+        if context is None:
+            raise ConnectionError("No device is connected, use Connect Device first")
+        return context
+
+    def connect_device(self, serial_url=None, alias=None, health_interval: float = 0, fail_fast: bool = True):
+        """
+        Connect to phone device and make it the current device,
+        if alias is already connected, switch to it instead of connecting again
+        :param serial_url: device serial or WiFi url, default lease a device of the pool configured by
+            Configure Device Pool or U2LIB_DEVICE_POOL, or connect by usb if there is no pool
+        :param alias: name used by Switch Device, default is serial_url
+        :param health_interval: seconds between background health probes, 0 disables the probe. When a probe
+            fails the device is connected again with backoff
+        :param fail_fast: with health probe, keywords fail at once with ConnectionError while the device is gone
+            instead of waiting their timeout
+        :return: alias
 
         Example:
             | Connect Device  |
@@ -32,15 +103,485 @@ class Actions:
             | Connect Device  | 192.168.1.100
             or
             | Connect Device  | http://192.168.1.100
+            or
+            | Connect Device  | 192.168.1.100 | sender
+            | Connect Device  | 192.168.1.101 | receiver
+            or
+            | Connect Device  | 192.168.1.100 | health_interval=5
+        """
+        alias = alias or serial_url or "default"
+        if alias in self._registry:
+            self._registry.switch(alias)
+        else:
+            lease = None
+            if serial_url is None and self._device_pool() is not None:
+                lease = self._device_pool().acquire()
+                serial_url = lease.serial
+            try:
+                context = self._registry.register(alias, serial_url, u2.connect(serial_url))
+            except Exception:
+                if lease is not None:
+                    lease.release()
+                raise
+            context.lease = lease
+            if health_interval:
+                context.start_health_monitor(health_interval, fail_fast)
+        return alias
+
+    def _device_pool(self):
+        """ DevicePool of Configure Device Pool or U2LIB_DEVICE_POOL, None if there is no pool """
+        if Actions._pool is None:
+            Actions._pool = DevicePool.from_env()
+        return Actions._pool
+
+    def configure_device_pool(self, devices, lock_dir=None):
+        """
+        Lease devices from a pool shared by the workers of the test run, Connect Device without serial_url leases
+        the least used free device and Disconnect Device releases it. Leases of crashed workers are freed by the
+        operating system, the remaining leases are released when the process exits
+        :param devices: list or comma separated serials or WiFi urls, or "adb" for every device adb lists
+        :param lock_dir: lease directory shared by the workers, default U2LIB_LEASE_DIR or the temp directory
+        :return:
+
+        Example:
+            | Configure Device Pool | serial1,serial2,serial3
+            | Connect Device        |
+            or
+            | Configure Device Pool | adb | lock_dir=/shared/leases
+        """
+        Actions._pool = DevicePool(devices, lock_dir)
+
+    def enable_coordinate_cache(self, ttl: float = 60, activity_ttl: float = 2):
+        """
+        Cache the center of clicked elements of the current device by activity and locator, a repeated
+        Click Element By Locator/Xpath of the same locator in the same activity taps the cached coordinates
+        without finding the element. For static controls such as tab bars and keypads only. Entries expire
+        after ttl, all entries are dropped when the window size changes
+        :param ttl: seconds an entry is used
+        :param activity_ttl: seconds the activity and window size read is reused, a cached click within it is
+            a single device call but may tap a screen which just changed, 0 reads it for every click, so a cached
+            click costs two device calls
+        :return: raise ConnectionError if no device is connected
+
+        Example:
+            | Enable Coordinate Cache |
+            or
+            | Enable Coordinate Cache | ttl=300 | activity_ttl=0
+        """
+        self._connected().coordinates = CoordinateCache(float(ttl), float(activity_ttl))
+
+    def disable_coordinate_cache(self) -> dict:
+        """
+        Stop caching the coordinates of the current device
+        :return: dict of hits, misses and entries of the cache, None if it was not enabled or no device is connected
+
+        Example:
+            | ${stats} | Disable Coordinate Cache
+        """
+        context = self._registry.current
+        if context is None:
+            return None
+        cache, context.coordinates = context.coordinates, None
+        return cache.stats if cache else None
+
+    def _poll_hierarchy(self, match, timeout=10, fresh=False):
+        """
+        Call match with the hierarchy snapshot until it returns a truthy value, the first poll reads the current
+        snapshot and dumps it again at once if it did not match, the next polls dump the hierarchy again
+        :param match: callable with HierarchyCache argument
+        :param timeout: default is 10 second
+        :param fresh: dump the hierarchy before the first poll too, for waits on an element to be gone, which an
+            old snapshot would never see
+        :return: the truthy value, or the last falsy value on timeout
+        """
+        polls = []
+
+        def condition():
+            if polls or fresh:
+                self.hierarchy.refresh()
+            polls.append(self.hierarchy.dump_count)
+            value = match(self.hierarchy)
+            if not value and len(polls) == 1 and not fresh and self.hierarchy.dump_count == polls[0]:
+                self.hierarchy.refresh()
+                value = match(self.hierarchy)
+            return value
+
+        return wait_until(condition, timeout, description="hierarchy snapshot").value
+
+    def _find_node(self, locator):
+        """
+        Find the first element matching locator in the hierarchy snapshot
+        :param locator: kwargs locator dict supported by LocatorIndex, or xpath string
+        :return: hierarchy node, None if not found
+        """
+        if isinstance(locator, dict):
+            nodes = self.hierarchy.index.find(**locator)
+        else:
+            nodes = [element.elem for element in self.device.xpath(locator, self.hierarchy.source).all()]
+        return nodes[0] if nodes else None
+
+    def _screen_fingerprint(self, method) -> str:
+        """
+        :param method: hierarchy or screenshot
+        :return: digest of the current screen
+        """
+        if method == "hierarchy":
+            return hierarchy_digest(self.hierarchy.refresh())
+        return image_fingerprint(self.device.screenshot(format="raw"))
+
+    def _wait_screen_stable(self, quiet=0.5, timeout=10, method="hierarchy") -> tuple:
+        """
+        Poll the screen fingerprint until it is unchanged for quiet seconds
+        :return: (stable, seconds waited)
+        """
+        if method not in ("hierarchy", "screenshot"):
+            raise ValueError(f"Unknown screen fingerprint '{method}', use hierarchy or screenshot")
+        quiet, timeout = float(quiet), float(timeout)
+        state = {"fingerprint": self._screen_fingerprint(method), "since": time.perf_counter()}
+
+        def unchanged():
+            fingerprint = self._screen_fingerprint(method)
+            now = time.perf_counter()
+            if fingerprint != state["fingerprint"]:
+                state["fingerprint"], state["since"] = fingerprint, now
+            return now - state["since"] >= quiet
+
+        interval = min(0.2, quiet / 2) or 0.05
+        result = wait_until(unchanged, timeout, interval=interval, max_interval=max(quiet / 2, interval),
+                            description="screen stable")
+        return bool(result), round(result.elapsed, 3)
+
+    def _input_text(self, text, focus, set_text):
+        """
+        Set text with the bulk input of Set Text Input Mode, or with set_text
+        :param text: text
+        :param focus: callable clicking the element
+        :param set_text: callable setting text to the element the usual way
+        :return:
+        """
+        settings = Actions._text_input
+        if settings is None or len(text) < settings["threshold"]:
+            set_text()
+            return
+        focus()
+        mode = input_bulk(self.device, text, settings["mode"], settings["chunk_size"])
+        if not settings["verify"]:
+            return
+        actual = self.device(focused=True).get_text()
+        if actual != text and settings["mode"] == "auto" and mode != "set_text":
+            logger.warning("%s input gave %d of %d characters, setting the text again", mode, len(actual or ""),
+                           len(text))
+            set_text()
+            actual = self.device(focused=True).get_text()
+        if actual != text:
+            raise AssertionError(f"Element has {len(actual or '')} characters after input, expected {len(text)}")
+
+    def _click_cached(self, locator, center) -> bool:
+        """
+        Click through the coordinate cache of the current device
+        :param locator: kwargs locator dict or xpath string
+        :param center: callable returning (x, y) of the element found on the device, None if not found
+        :return: False if the element is not found
+        """
+        cache = self._registry.current.coordinates
+        state = cache.state(self.device)
+        point = cache.get(state, locator)
+        if point is None:
+            point = center()
+            if point is None:
+                return False
+            cache.put(state, locator, point)
+        self.device.click(*point)
+        return True
+
+    @staticmethod
+    def _named_locators(locators) -> tuple:
+        """
+        :param locators: list of locators, or dict of name: locator, a locator is a kwargs locator dict supported
+            by LocatorIndex or xpath string
+        :return: (names, locators), names are positions for a list
+        """
+        if isinstance(locators, dict):
+            names, locators = list(locators.keys()), list(locators.values())
+        else:
+            locators = list(locators)
+            names = list(range(len(locators)))
+        for locator in locators:
+            if isinstance(locator, dict) and not LocatorIndex.supports(locator):
+                raise TypeError(f"Locator {locator} has keys the hierarchy snapshot cannot answer")
+        return names, locators
+
+    def configure_library_logger(self, level=None, log_dir=None, console: bool = None, asynchronous: bool = None):
+        """
+        Replace the handlers of the library logger, the log file is created on the first record
+        :param level: DEBUG, INFO, WARNING, ERROR, default from U2LIB_LOG_LEVEL or DEBUG
+        :param log_dir: directory of log files, empty string disables the log file, default from U2LIB_LOG_DIR or ./logs
+        :param console: False disables console output
+        :param asynchronous: False writes records in the keyword thread instead of a background thread
+        :return:
+
+        Example:
+            | Configure Library Logger | INFO | ${OUTPUT_DIR}/logs
+            or
+            | Configure Library Logger | level=WARNING | log_dir=${EMPTY} | console=False
+        """
+        configure_logger(level, log_dir, console, asynchronous)
+
+    def dump_keyword_metrics(self, path):
+        """
+        Write wall time, device HTTP calls and wait time statistics of every keyword to json file
+        :param path: json file path
+        :return:
+
+        Example:
+            | Dump Keyword Metrics | ${OUTPUT_DIR}/keyword_metrics.json
+        """
+        metrics.dump(path)
+
+    def get_keyword_metrics(self) -> dict:
+        """
+        Gets wall time, device HTTP calls and wait time statistics of every keyword
+        :return: {keyword: {"count": n, "wall": stats, "execute": stats, "wait": stats, "rpc": stats}},
+            stats is {"total", "p50", "p95", "max"} in seconds, execute is wall time minus wait time
+
+        Example:
+            | &{variable} | Get Keyword Metrics
+        """
+        return metrics.summary()
+
+    def log_keyword_metrics(self):
+        """
+        Write the p50/p95/max table of keyword wall time, wait time and device HTTP calls to the log
+        :return:
+
+        Example:
+            | Log Keyword Metrics
         """
-        if self.device is None:
-            self.device = u2.connect(serial_url)
+        try:
+            from robot.api import logger as robot_logger
+        except ImportError:
+            logger.info(json.dumps(metrics.summary(), indent=2))
+        else:
+            robot_logger.info(metrics.html(), html=True)
 
+    def reset_keyword_metrics(self):
+        """
+        Drop the statistics collected so far
+        :return:
+
+        Example:
+            | Reset Keyword Metrics
+        """
+        metrics.reset()
+
+    def get_app_launch_summary(self) -> dict:
+        """
+        Launch times of Dev App Start, by package and the launch state reported by Android
+        :return: {package: {launch_state: {"count": n, "total_time": stats, "ready_time": stats}}},
+            stats is {"total", "p50", "p95", "max"} in seconds
+
+        Example:
+            | &{summary} | Get App Launch Summary
+            | Should Be True | ${summary}[com.example.test][COLD][total_time][p95] < 2
+        """
+        return launch_times.summary()
+
+    def reset_app_launch_times(self):
+        """
+        Drop the launch times collected so far
+        :return:
 
+        Example:
+            | Reset App Launch Times
+        """
+        launch_times.reset()
+
+    def start_recording(self, path):
+        """
+        Record every HTTP/JSON-RPC exchange of the current device, including hierarchy xml and screenshots,
+        to a gzip json lines trace which Start Replay Server can serve without device
+        :param path: trace file, e.g. trace.jsonl.gz
+        :return:
+
+        Example:
+            | Connect Device  | 192.168.1.100
+            | Start Recording | ${OUTPUT_DIR}/login.jsonl.gz
+        """
+        context = self._registry.current
+        context.stop_recording()
+        context.recorder = TraceRecorder(path)
+        add_response_hook(context.device, context.recorder.hook)
+
+    def stop_recording(self) -> int:
+        """
+        Stop recording the current device and close the trace
+        :return: number of exchanges recorded
+
+        Example:
+            | ${count} | Stop Recording
+        """
+        return self._registry.current.stop_recording()
+
+    def start_replay_server(self, path, port: int = 0, latency: float = 0, fuzzy: bool = False) -> str:
+        """
+        Serve a trace recorded by Start Recording from a local stand-in of the device, Connect Device to the
+        returned url runs the keywords without phone. Requests are answered by the recorded answer of the same
+        JSON-RPC method and params, in recorded order
+        :param path: trace file
+        :param port: local port, default any free port
+        :param latency: seconds added to every answer
+        :param fuzzy: answer a request that was not recorded with an answer of the same JSON-RPC method recorded
+            with other params instead of an error, the request still counts as a miss
+        :return: url of the server
+
+        Example:
+            | ${url} | Start Replay Server | ${CURDIR}/login.jsonl.gz
+            | Connect Device | ${url} | replay
+        """
+        self.stop_replay_server()
+        Actions._replay = ReplayServer(path, port=port, latency=latency, fuzzy=fuzzy)
+        return Actions._replay.start()
+
+    def stop_replay_server(self) -> int:
+        """
+        Stop the replay server
+        :return: number of requests which were not recorded in the trace, fuzzy answers included
+
+        Example:
+            | ${misses} | Stop Replay Server
+            | Should Be Equal As Integers | ${misses} | 0
+        """
+        replay, Actions._replay = Actions._replay, None
+        if replay is None:
+            return 0
+        replay.stop()
+        return replay.misses
+
+    def switch_device(self, alias):
+        """
+        Switch the current device, the following keywords drive this device
+        :param alias: alias given to Connect Device
+        :return: alias of the previous device
+
+        Example:
+            | Connect Device  | 192.168.1.100 | sender
+            | Connect Device  | 192.168.1.101 | receiver
+            | Switch Device   | sender
+        """
+        return self._registry.switch(alias)
+
+    def disconnect_device(self, alias=None):
+        """
+        Forget the device, if it is the current device there is no current device until Switch Device
+        :param alias: alias given to Connect Device, default is the current device
+        :return:
+
+        Example:
+            | Disconnect Device  |
+            or
+            | Disconnect Device  | receiver
+        """
+        if alias is None:
+            if self._registry.current is None:
+                return
+            alias = self._registry.current.alias
+        self._registry.remove(alias).close()
+
+
+@instrumented
 class UiActions(Actions):
     def __init__(self):
         super(UiActions, self).__init__()
+        self._locator_mode = "remote"
+
+    def _use_index(self, kwargs) -> bool:
+        return self._locator_mode == "local" and LocatorIndex.supports(kwargs)
+
+    def _wait_exists(self, timeout, element=None, **kwargs) -> bool:
+        """
+        Wait UiObject or locator show on page, returns as soon as it exists, in local mode the locator is looked up
+        in the current hierarchy snapshot and the hierarchy is dumped again only while it is not found
+        :param timeout: max wait seconds
+        :param element: UiObject, if it is None kwargs locator is used
+        :return: bool
+        """
+        if element is None and self._use_index(kwargs):
+            return self._poll_hierarchy(lambda hierarchy: hierarchy.index.exists(**kwargs), timeout=timeout)
+        element = element or self.device(**kwargs)
+        return wait_until(element.exists, timeout, description=str(element.selector)).value
+
+    def _wait_index(self, timeout, **kwargs) -> list:
+        """
+        Wait locator show in the hierarchy snapshot, the current snapshot is read first and dumped again only while
+        the locator is not found
+        :return: matched nodes, raise UiObjectNotFoundError on timeout
+        """
+        nodes = self._poll_hierarchy(lambda hierarchy: hierarchy.index.find(**kwargs), timeout=timeout)
+        if not nodes:
+            raise u2.UiObjectNotFoundError({'code': -32002, 'data': str(kwargs), 'method': 'wait'})
+        return nodes
 
+    def set_locator_mode(self, mode):
+        """
+        Choose how kwargs locators are answered by Element Is Existed By Locator, Get Elements Count By Locator,
+        Find Element By Locator and Get Element Attribute By Locator
+        :param mode: remote: every query is sent to the device as UiSelector, it is the default
+            local: queries are answered by an index over the hierarchy snapshot, which is dumped again when
+            a locator is not found or after a screen changing keyword, locators with keys the index does not
+            support are still sent to the device
+        :return: previous mode
+
+        Example:
+            | Set Locator Mode | local
+        """
+        assert mode in ["remote", "local"]
+        previous, self._locator_mode = self._locator_mode, mode
+        return previous
+
+    def set_click_stabilization(self, quiet: float = 0.5, timeout: float = 5, method="hierarchy"):
+        """
+        Wait until the screen is stable after every click keyword (Click Element By Locator/Xpath, Long Click
+        Element By Locator/Xpath, Dev Click Screen, Dev Double Click Screen, Dev Long Click Screen),
+        a click whose screen does not get stable in timeout logs a warning. quiet=0 disables it
+        :param quiet: seconds the screen must not change
+        :param timeout: max seconds to wait after a click
+        :param method: hierarchy or screenshot, see Wait Until Screen Stable
+        :return:
+
+        Example:
+            | Set Click Stabilization | quiet=0.5 | timeout=5
+            or
+            | Set Click Stabilization | quiet=0
+        """
+        if method not in ("hierarchy", "screenshot"):
+            raise ValueError(f"Unknown screen fingerprint '{method}', use hierarchy or screenshot")
+        Actions._stabilization = {"quiet": quiet, "timeout": timeout, "method": method} if float(quiet) > 0 else None
+
+    def set_text_input_mode(self, mode="auto", threshold: int = 1000, chunk_size: int = 16000, verify: bool = True):
+        """
+        Input texts of threshold characters or more in Set Element Text By Locator/Xpath with a bulk input path:
+        the element is clicked to focus it and the text replaces its text in chunks, the shorter texts are set
+        as before
+        :param mode: auto uses the FastInputIME broadcasts when FastInputIME is the current input method and
+            the clipboard otherwise, ime switches to FastInputIME, clipboard pastes, set_text disables bulk input
+        :param threshold: characters from which a text is input in bulk
+        :param chunk_size: characters per FastInputIME broadcast, the clipboard is set and pasted once
+        :param verify: read the text of the element back once and compare, in auto mode a mismatch is input again
+            with set_text, use False for password fields
+        :return:
+
+        Example:
+            | Set Text Input Mode | auto | threshold=500
+            | Set Element Text By Locator | ${long_json} | resourceId=com.example.test:id/body
+            or
+            | Set Text Input Mode | set_text
+        """
+        if mode not in TEXT_INPUT_MODES:
+            raise ValueError(f"Unknown text input mode '{mode}', use {', '.join(TEXT_INPUT_MODES)}")
+        Actions._text_input = None if mode == "set_text" else {"mode": mode, "threshold": int(threshold),
+                                                               "chunk_size": int(chunk_size), "verify": verify}
+
+    @invalidates_hierarchy
     def clear_element_text_by_locator(self, *args, **kwargs):
         """
         clear UiObject text
@@ -67,6 +608,8 @@ class UiActions(Actions):
         else:
             raise TypeError("clear_ui_text() wrong number or type of argument")
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def click_element_by_locator(self, *args, **kwargs):
         """
         click UiObject on page
@@ -87,9 +630,13 @@ class UiActions(Actions):
             | Click Element By Locator  | 3 | &{locator}
         """
         if len(args) == 1 and isinstance(args[0], u2.UiObject):
-            args[0].click_exists(timeout=10)
+            with metrics.waiting():
+                args[0].click_exists(timeout=10)
         elif len(args) == 1 and isinstance(args[0], int) and kwargs:
-            self.device(**kwargs).click_exists(timeout=args[0])
+            if self._registry.current.coordinates is not None:
+                return self._click_cached(kwargs, lambda: self._locator_center(args[0], **kwargs))
+            with metrics.waiting():
+                self.device(**kwargs).click_exists(timeout=args[0])
         elif len(args) == 2 and not kwargs:
             element = None
             sleep_time = None
@@ -100,16 +647,29 @@ class UiActions(Actions):
                     sleep_time = arg
                 else:
                     raise TypeError("click_ui() wrong number or type of argument")
-            element.click_exists(timeout=sleep_time)
+            with metrics.waiting():
+                element.click_exists(timeout=sleep_time)
         elif not args and kwargs:
-            return self.device(**kwargs).click_exists(timeout=10)
+            if self._registry.current.coordinates is not None:
+                return self._click_cached(kwargs, lambda: self._locator_center(10, **kwargs))
+            with metrics.waiting():
+                return self.device(**kwargs).click_exists(timeout=10)
         else:
             raise TypeError(f"click_ui() wrong number or type of argument")
 
+    def _locator_center(self, timeout, **kwargs):
+        """
+        :return: (x, y) of the element, None if it does not show in timeout
+        """
+        element = self.device(**kwargs)
+        with metrics.waiting():
+            found = element.wait(timeout=timeout)
+        return element.center() if found else None
+
     def element_is_existed_by_locator(self, *args, **kwargs) -> bool:
         """
         If UiObject is show on page, return True, else return False
-        :param args: Only include sleep-time/UiObject, sleep-time is sleep before return status
+        :param args: Only include max-wait-time/UiObject, returns as soon as UiObject shows or max-wait-time passes
         :param kwargs: locator dict
         :return:
 
@@ -126,25 +686,88 @@ class UiActions(Actions):
         if len(args) == 1 and isinstance(args[0], u2.UiObject):
             return args[0].exists()
         elif len(args) == 1 and isinstance(args[0], int) and kwargs:
-            sleep(args[0])
-            return self.device(**kwargs).exists()
+            return self._wait_exists(args[0], **kwargs)
         elif len(args) == 2 and not kwargs:
             element = None
-            sleep_time = None
+            wait_time = None
             for arg in args:
                 if isinstance(arg, u2.UiObject):
                     element = arg
                 elif isinstance(arg, int):
-                    sleep_time = arg
+                    wait_time = arg
                 else:
                     raise TypeError("ui_is_existed() wrong number or type of argument")
-            sleep(sleep_time)
-            return element.exists()
+            return self._wait_exists(wait_time, element)
         elif not args and kwargs:
+            if self._use_index(kwargs):
+                return self._wait_exists(0, **kwargs)
             return self.device(**kwargs).exists()
         else:
             raise TypeError(f"ui_is_existed() wrong number or type of argument")
 
+    @invalidates_hierarchy
+    def execute_batch(self, operations) -> list:
+        """
+        Run operations with as few device round trips as possible: locators are resolved against one hierarchy
+        snapshot and all device calls are sent to the uiautomator2 server in one JSON-RPC batch request
+        :param operations: list of operation dict, locator is a kwargs locator dict or xpath string
+            {"action": "click", "locator": locator}
+            {"action": "set_text", "locator": locator, "text": text}
+            {"action": "get_attribute", "locator": locator, "attribute": attribute}, without attribute returns info dict
+            {"action": "press_key", "key": key}, key name or key code
+            add "refresh": True to an operation to send the calls before it and dump the hierarchy again,
+            otherwise every locator and attribute is read from the snapshot taken before the batch
+        :return: list of results in operation order, attribute value or info dict for get_attribute,
+            the server answer for the others
+
+        Example:
+            &{user}        action=set_text    locator=&{username}    text=admin
+            &{password}    action=set_text    locator=//*[@resource-id="com.example.test:id/password"]    text=secret
+            &{login}       action=click       locator=&{login_button}
+            | @{variable} | Execute Batch | ${{[$user, $password, $login]}}
+        """
+        results = [None] * len(operations)
+        batch = JsonRpcBatch(self.device)
+        # operation position -> position of its call in the batch
+        pending = {}
+
+        def send():
+            values = batch.send()
+            for operation_position, call_position in pending.items():
+                results[operation_position] = values[call_position]
+            pending.clear()
+
+        for position, operation in enumerate(operations):
+            action = operation.get("action")
+            locator = operation.get("locator")
+            if operation.get("refresh"):
+                send()
+                self.hierarchy.refresh()
+            if action == "press_key":
+                key = operation["key"]
+                if str(key).isdigit():
+                    pending[position] = batch.add("pressKeyCode", int(key))
+                else:
+                    pending[position] = batch.add("pressKey", key)
+            elif action == "set_text" and isinstance(locator, dict):
+                pending[position] = batch.add("setText", u2.Selector(**locator), str(operation["text"]))
+            elif action in ("click", "set_text", "get_attribute"):
+                node = self._find_node(locator)
+                if node is None:
+                    raise u2.UiObjectNotFoundError({'code': -32002, 'data': str(locator), 'method': action})
+                if action == "get_attribute":
+                    info = node_info(node)
+                    results[position] = info[operation["attribute"]] if operation.get("attribute") else info
+                    continue
+                pending[position] = batch.add("click", *node_center(node))
+                if action == "set_text":
+                    # the click focuses the xpath element, so the text is set to the focused element
+                    pending[position] = batch.add("setText", u2.Selector(focused=True), str(operation["text"]))
+            else:
+                raise TypeError(f"execute_batch() unsupported operation {operation}")
+        send()
+        return results
+
     def find_element_by_locator(self, timeout=10, **kwargs):
         """
         If UiObject is show on page, return UiObject
@@ -160,11 +783,16 @@ class UiActions(Actions):
             &{variable}        resourceId=com.example.test:id/username    className=android.widget.EditText
             | ${variable} | Find Element By Locator  | 3 | &{locator}
         """
-        self.device(**kwargs).must_wait(timeout=timeout)
-        return self.device(**kwargs)
+        ui_object = self.device(**kwargs)
+        if self._use_index(kwargs):
+            self._wait_index(timeout, **kwargs)
+        else:
+            with metrics.waiting():
+                ui_object.must_wait(timeout=timeout)
+        return ui_object
 
     @staticmethod
-    def find_element_by_locator_with_direction(ui: u2.UiObject, direction, **kwargs):
+    def find_element_by_locator_with_direction(ui, direction, **kwargs):
         """
         Find UiObject by direction and locator with specified origin UiObject
         :param ui: specified origin UiObject
@@ -190,7 +818,7 @@ class UiActions(Actions):
     def find_element_child_by_locator(self, *args, **kwargs):
         """
         Find child UiObject with child locator under the specified UiObject
-        :param args: sleep-time/parent UiObjects, no default sleep-time
+        :param args: max-wait-time/parent UiObjects, wait until the parent shows, no default max-wait-time
         :param kwargs: locator dict
         :return:
             1. if only one of the parent UiObject and kwargs locator is input，
@@ -216,19 +844,19 @@ class UiActions(Actions):
             else:
                 return args[0].child()
         elif len(args) == 1 and isinstance(args[0], int) and kwargs:
-            sleep(args[0])
+            self._wait_exists(args[0], **kwargs)
             return self.device(**kwargs).child()
         elif len(args) == 2:
             element = None
-            sleep_time = None
+            wait_time = None
             for arg in args:
                 if isinstance(arg, u2.UiObject):
                     element = arg
                 elif isinstance(arg, int):
-                    sleep_time = arg
+                    wait_time = arg
                 else:
                     raise TypeError("find_child_ui() wrong number or type of argument")
-            sleep(sleep_time)
+            self._wait_exists(wait_time, element)
             if kwargs:
                 return element.child(**kwargs)
             else:
@@ -239,7 +867,7 @@ class UiActions(Actions):
             raise TypeError("find_child_ui() wrong number or type of argument")
 
     @staticmethod
-    def find_element_child_by_locator_with_description(parent: u2.UiObject, txt, **kwargs) -> u2.UiObject:
+    def find_element_child_by_locator_with_description(parent, txt, **kwargs):
         """
         Find child UiObject by description and locator
         :param parent: parent UiObject
@@ -260,7 +888,7 @@ class UiActions(Actions):
         return parent.child_by_description(txt, **kwargs)
 
     @staticmethod
-    def find_element_child_by_locator_with_index(parent: u2.UiObject, index: int, **kwargs) -> u2.UiObject:
+    def find_element_child_by_locator_with_index(parent, index: int, **kwargs):
         """
         Find child UiObject by instance index and locator
         :param parent: parent UiObject
@@ -279,7 +907,7 @@ class UiActions(Actions):
         return parent.child_by_instance(index, **kwargs)
 
     @staticmethod
-    def find_element_child_by_locator_with_text(parent: u2.UiObject, txt, **kwargs) -> u2.UiObject:
+    def find_element_child_by_locator_with_text(parent, txt, **kwargs):
         """
         Find child UiObject by text and locator
         :param parent: parent UiObject
@@ -300,7 +928,7 @@ class UiActions(Actions):
         return parent.child_by_text(txt, **kwargs)
 
     @staticmethod
-    def find_element_sibling_by_locator(ui: u2.UiObject, **kwargs) -> u2.UiObject:
+    def find_element_sibling_by_locator(ui, **kwargs):
         """
         Find sibling UiObject by locator
         :param ui: UiObject
@@ -346,10 +974,14 @@ class UiActions(Actions):
                      "visibleBounds", "checkable", "checked", "clickable", "enabled", "focusable", "focused",
                      "longClickable", "scrollable", "selected"]
         if len(args) == 1 and isinstance(args[0], int) and kwargs:
-            sleep(args[0])
+            if self._use_index(kwargs):
+                return node_info(self._wait_index(args[0], **kwargs)[0])
+            self._wait_exists(args[0], **kwargs)
             return self.device(**kwargs).info
         elif len(args) == 1 and isinstance(args[0], str) and kwargs:
             assert args[0] in attribute
+            if self._use_index(kwargs):
+                return node_info(self._wait_index(0, **kwargs)[0])[args[0]]
             return self.device(**kwargs).info[args[0]]
         elif 4 > len(args) > 1 and not kwargs:
             element = None
@@ -368,15 +1000,62 @@ class UiActions(Actions):
                 if attribute_str:
                     assert attribute_str in attribute
                 if timeout:
-                    sleep(timeout)
+                    self._wait_exists(timeout, element)
                 return element.info[attribute_str] if attribute_str else element.info
             else:
                 raise TypeError("get_ui_info_or_attribute() wrong number or arguments or type")
         elif not args and kwargs:
+            if self._use_index(kwargs):
+                return node_info(self._wait_index(0, **kwargs)[0])
             return self.device(**kwargs).info
         else:
             raise TypeError("get_ui_info_or_attribute() wrong number or arguments or type")
 
+    def get_elements_attributes(self, locators, attributes=None, timeout=0) -> dict:
+        """
+        Read attributes of several elements from one hierarchy snapshot, without device round trip per element
+        :param locators: list of locators, or dict of name: locator, a locator is a kwargs locator dict
+            or xpath string
+        :param attributes: list or comma separated attributes, default every attribute of the info dict:
+            bounds, childCount, className, contentDescription, packageName, resourceName, text, visibleBounds,
+            checkable, checked, clickable, enabled, focusable, focused, longClickable, scrollable, selected
+        :param timeout: max seconds to wait until every element shows, default read the snapshot once
+        :return: dict of name (position for a list) -> dict of attribute: value, None if the element is not found
+
+        Example:
+            &{username}    resourceId=com.example.test:id/username
+            | &{values} | Get Elements Attributes | ${{[$username, '//*[@text="Login"]']}} | text,enabled
+            | Should Be Equal | ${values}[0][text] | admin
+            or
+            &{form}    user=&{username}    login=//*[@text="Login"]
+            | &{values} | Get Elements Attributes | ${form} | text,bounds | timeout=5
+            | Should Be True | ${values}[login][enabled]
+        """
+        if isinstance(attributes, str):
+            attributes = attributes.split(",")
+        attributes = [attribute.strip() for attribute in attributes or INFO_KEYS]
+        for attribute in attributes:
+            if attribute not in INFO_KEYS:
+                raise ValueError(f"Unknown attribute '{attribute}', supported: {', '.join(INFO_KEYS)}")
+        names, locators = self._named_locators(locators)
+
+        def match(hierarchy):
+            nodes = [self._find_node(locator) for locator in locators]
+            return nodes if all(node is not None for node in nodes) else None
+
+        nodes = self._poll_hierarchy(match, float(timeout)) if float(timeout) > 0 else None
+        if nodes is None:
+            # timed out or no wait: return what the snapshot has
+            nodes = [self._find_node(locator) for locator in locators]
+        results = {}
+        for name, node in zip(names, nodes):
+            if node is None:
+                results[name] = None
+                continue
+            info = node_info(node)
+            results[name] = {attribute: info[attribute] for attribute in attributes}
+        return results
+
     def get_element_text_by_locator(self, *args, **kwargs):
         """
         Gets the text of the UiObject
@@ -429,9 +1108,13 @@ class UiActions(Actions):
             &{locator}        resourceId=com.example.test:id/username    className=android.widget.EditText
             | ${variable} | Get Elements Count By Locator  | 3 | &{locator}
         """
+        if self._use_index(kwargs):
+            return len(self._wait_index(timeout, **kwargs))
         ui_object = self.find_element_by_locator(timeout, **kwargs)
         return len(ui_object)
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def long_click_element_by_locator(self, duration=1, **kwargs):
         """
         Long click UiObjects
@@ -449,6 +1132,7 @@ class UiActions(Actions):
         """
         self.device(**kwargs).long_click(duration=duration)
 
+    @invalidates_hierarchy
     def scroll_backward(self):
         """
         Slide the interface vertically downward
@@ -459,6 +1143,7 @@ class UiActions(Actions):
         """
         return self.device(scrollable=True).scroll.backward()
 
+    @invalidates_hierarchy
     def scroll_forward(self):
         """
         Slide the interface vertically upward
@@ -469,6 +1154,7 @@ class UiActions(Actions):
         """
         return self.device(scrollable=True).scroll.forward()
 
+    @invalidates_hierarchy
     def scroll_to_beginning(self):
         """
         Slide the interface to the top
@@ -479,6 +1165,7 @@ class UiActions(Actions):
         """
         self.device(scrollable=True).scroll.toBeginning()
 
+    @invalidates_hierarchy
     def scroll_to_end(self):
         """
         Slide the interface to the end
@@ -489,6 +1176,7 @@ class UiActions(Actions):
         """
         self.device(scrollable=True).scroll.toEnd()
 
+    @invalidates_hierarchy
     def scroll_to_text(self, text):
         """
         Slide the interface vertically upward to text
@@ -499,6 +1187,7 @@ class UiActions(Actions):
         """
         return self.device(scrollable=True).scroll.to(text=text)
 
+    @invalidates_hierarchy
     def set_element_text_by_locator(self, *args, **kwargs):
         """
         Set text to UiObject, if you want to clear text, please use Clear Ui Text keyword
@@ -515,7 +1204,8 @@ class UiActions(Actions):
             | Set Element Text By Locator  | text | &{locator}
         """
         if len(args) == 1 and not isinstance(args[0], u2.UiObject) and kwargs:
-            self.device(**kwargs).set_text(str(args[0]), timeout=5)
+            element, text = self.device(**kwargs), str(args[0])
+            self._input_text(text, lambda: element.click(timeout=5), lambda: element.set_text(text, timeout=5))
         elif len(args) == 2 and not kwargs:
             text = None
             element = None
@@ -525,7 +1215,7 @@ class UiActions(Actions):
                 else:
                     text = str(arg)
             if element:
-                element.set_text(text, timeout=5)
+                self._input_text(text, lambda: element.click(timeout=5), lambda: element.set_text(text, timeout=5))
             else:
                 raise TypeError("set_text_to_ui() wrong number or arguments or type")
         else:
@@ -543,11 +1233,86 @@ class UiActions(Actions):
             or
             | ${variable} | Wait Element Visible By Locator  | 5 | resourceId=com.example.test:id/username
         """
-        if self.device(**kwargs).wait(timeout=timeout):
+        with metrics.waiting():
+            found = self.device(**kwargs).wait(timeout=timeout)
+        if found:
             return True
         else:
             raise TimeoutError
 
+    def wait_for_any_element(self, locators, timeout=10):
+        """
+        Wait until one of several elements shows, e.g. which of login form, error dialog or home screen appeared.
+        Every poll dumps the hierarchy once and checks all locators against it, the whole wait is bounded by timeout
+        :param locators: list of locators, or dict of name: locator, a locator is a kwargs locator dict
+            or xpath string
+        :param timeout: max seconds to wait, default is 10 second, raise TimeoutError after
+        :return: position (name for a dict) of the first locator in order that matched
+
+        Example:
+            &{home}    resourceId=com.example.test:id/home
+            &{screens}    login=//*[@resource-id="com.example.test:id/username"]    error=//*[@text="Error"]    home=&{home}
+            | ${screen} | Wait For Any Element | ${screens} | 15
+            | IF | $screen == "login" | Login
+        """
+        names, locators = self._named_locators(locators)
+
+        def match(hierarchy):
+            for name, locator in zip(names, locators):
+                if self._find_node(locator) is not None:
+                    return [name]
+            return None
+
+        found = self._poll_hierarchy(match, float(timeout))
+        if not found:
+            raise TimeoutError(f"None of {locators} showed in {timeout}s")
+        return found[0]
+
+    def wait_for_all_elements(self, locators, timeout=10) -> bool:
+        """
+        Wait until all elements show, every poll dumps the hierarchy once and checks all locators against it,
+        the whole wait is bounded by timeout
+        :param locators: list of locators, or dict of name: locator, a locator is a kwargs locator dict
+            or xpath string
+        :param timeout: max seconds to wait, default is 10 second, raise TimeoutError after
+        :return: True
+
+        Example:
+            &{username}    resourceId=com.example.test:id/username
+            | Wait For All Elements | ${{[$username, '//*[@text="Login"]']}} | 15
+        """
+        names, locators = self._named_locators(locators)
+        missing = []
+
+        def match(hierarchy):
+            missing[:] = [name for name, locator in zip(names, locators) if self._find_node(locator) is None]
+            return not missing
+
+        if not self._poll_hierarchy(match, float(timeout)):
+            raise TimeoutError(f"{[locators[names.index(name)] for name in missing]} did not show in {timeout}s")
+        return True
+
+    def wait_until_screen_stable(self, quiet: float = 0.5, timeout: float = 10, method="hierarchy") -> float:
+        """
+        Wait until animations and loading end: the screen fingerprint must stay unchanged for quiet seconds
+        :param quiet: seconds the screen must not change
+        :param timeout: max seconds to wait, raise TimeoutError after
+        :param method: hierarchy digests the ui hierarchy (status bar excluded), screenshot hashes a downscaled
+            screenshot, for content the hierarchy does not show such as video, maps or games
+        :return: seconds waited
+
+        Example:
+            | Click Element By Locator | text=Settings
+            | ${waited} | Wait Until Screen Stable
+            or
+            | Wait Until Screen Stable | quiet=1 | timeout=20 | method=screenshot
+        """
+        stable, elapsed = self._wait_screen_stable(quiet, timeout, method)
+        if not stable:
+            raise TimeoutError(f"Screen still changing after {timeout}s")
+        logger.info("screen stable after %.3fs", elapsed)
+        return elapsed
+
     def wait_element_invisible_by_locator(self, timeout=10, **kwargs) -> bool:
         """
         Wait the locator disappear on page
@@ -560,17 +1325,21 @@ class UiActions(Actions):
             or
             | ${variable} | Wait Element Invisible By Locator  | 5 | resourceId=com.example.test:id/username
         """
-        if self.device(**kwargs).wait_gone(timeout=timeout):
+        with metrics.waiting():
+            gone = self.device(**kwargs).wait_gone(timeout=timeout)
+        if gone:
             return True
         else:
             raise TimeoutError
 
 
+@instrumented
 class DeviceActions(Actions):
 
     def __init__(self):
         super(DeviceActions, self).__init__()
 
+    @invalidates_hierarchy
     def dev_app_clear(self, package):
         """
         Clear the application data based on the package name
@@ -600,28 +1369,122 @@ class DeviceActions(Actions):
         """
         return self.device.app_info(package)
 
-    def dev_app_install(self, data):
+    @invalidates_hierarchy
+    def dev_app_install(self, data, package=None, cache: bool = True) -> bool:
         """
-        Install the application based on data
-        :param data: can be file path or url or file object
-        :return:
+        Install the application based on data, the install is skipped if the device has the same apk installed
+        :param data: can be file path or url or file object, only a file path is compared with the installed apk
+        :param package: application package name of the apk, needed for the comparison, default is read from the
+            apk with apkutils (pip install adbutils[apk]) or with aapt2, aapt or apkanalyzer of the Android SDK on
+            PATH, without any of them the apk is installed every time unless package is given
+        :param cache: False installs the apk even if the same apk is installed
+        :return: False if the install was skipped
 
         Example:
-            | Dev App Install | package name
+            | Dev App Install | apk path
+            or
+            | ${installed} | Dev App Install | apk path | package=com.example.test
         """
-        self.device.app_install(data)
+        return install_apk(self.device, data, package, cache)
 
-    def dev_app_start(self, package):
+    def dev_app_install_on_all_devices(self, data, package=None, cache: bool = True, workers: int = 8) -> dict:
         """
-        Launch the application based on the package name, and stop it before start application
+        Install the application on every connected device at the same time, skipped on the devices that have
+        the same apk installed
+        :param data: file path or url
+        :param package: application package name of the apk, see Dev App Install
+        :param cache: False installs the apk even if the same apk is installed
+        :param workers: devices installed at the same time
+        :return: {alias: False if the install was skipped}, raise RuntimeError listing the devices the install
+            failed on after all installs finished
+
+        Example:
+            | Connect Device | 192.168.1.10:5555 | phone
+            | Connect Device | 192.168.1.11:5555 | tablet
+            | &{installed} | Dev App Install On All Devices | apk path | package=com.example.test
+        """
+        if not isinstance(data, str):
+            raise TypeError("dev_app_install_on_all_devices() data must be a file path or url")
+        if os.path.isfile(data):
+            # hash the apk once before the devices compare it
+            local_digest(data)
+        contexts = list(self._registry)
+        with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(contexts) or 1))) as executor:
+            futures = {context.alias: executor.submit(install_apk, context.device, data, package, cache)
+                       for context in contexts}
+        results, failures = {}, {}
+        for alias, future in futures.items():
+            try:
+                results[alias] = future.result()
+            except Exception as e:
+                failures[alias] = e
+        for context in contexts:
+            context.hierarchy.invalidate()
+        if failures:
+            raise RuntimeError(f"Install of {data} failed on {failures}, done on {results}")
+        return results
+
+    @invalidates_hierarchy
+    def dev_app_start(self, package, mode="cold", activity=None, wait_activity=None, timeout: float = 20, **kwargs):
+        """
+        Launch the application based on the package name and measure the launch, the launch is added to
+        Get App Launch Summary
         :param package: application package name
-        :return:
+        :param mode: cold stops the application before start, warm starts it as it is so a running application
+            is not started again, hot goes to the home screen first and brings the running application back
+        :param activity: activity to start, default is the launcher activity
+        :param wait_activity: activity the launch ends at, e.g. the main screen after a splash screen
+        :param timeout: max seconds to wait for wait_activity or the locator, raise TimeoutError after
+        :param kwargs: locator dict of the element the launch ends at
+        :return: dict of status, launch_state (COLD, WARM, HOT as reported by Android), activity, total_time from
+            the intent to the first frame, wait_time, and ready_time until wait_activity or the element showed,
+            times in seconds
 
         Example:
             | Dev App Start | package name
-        """
-        self.device.app_start(package_name=package, wait=True, stop=True)
-
+            or
+            | ${launch} | Dev App Start | package name | mode=warm
+            or
+            | ${launch} | Dev App Start | package name | wait_activity=.MainActivity | timeout=30
+            or
+            | ${launch} | Dev App Start | package name | resourceId=com.example.test:id/home
+        """
+        started = time.perf_counter()
+        output, _ = self.device.shell(launch_command(package, activity, mode))
+        launch = parse_am_start(output)
+        if launch["status"] is None and not activity:
+            # resolve-activity needs Android 7, read the launcher activity with the uiautomator2 app info
+            try:
+                activity = self.device.app_info(package)["mainActivity"]
+            except Exception as e:
+                logger.debug("app info of %s failed: %r", package, e)
+            if activity:
+                started = time.perf_counter()
+                output, _ = self.device.shell(launch_command(package, activity, mode))
+                launch = parse_am_start(output)
+        if launch["status"] is None:
+            raise AssertionError(f"{package} did not start: {output.strip()}")
+        launch["ready_time"] = None
+        if wait_activity:
+            with metrics.waiting():
+                shown = self.device.wait_activity(wait_activity, timeout=timeout)
+            if not shown:
+                raise TimeoutError(f"{package} did not show {wait_activity} in {timeout}s")
+            launch["ready_time"] = round(time.perf_counter() - started, 3)
+        if kwargs:
+            if LocatorIndex.supports(kwargs):
+                found = self._poll_hierarchy(lambda hierarchy: hierarchy.index.find(**kwargs), timeout=timeout)
+            else:
+                with metrics.waiting():
+                    found = self.device(**kwargs).wait(timeout=timeout)
+            if not found:
+                raise TimeoutError(f"{package} did not show {kwargs} in {timeout}s")
+            launch["ready_time"] = round(time.perf_counter() - started, 3)
+        launch_times.add(package, launch)
+        logger.info("%s %s start: %s", package, mode, launch)
+        return launch
+
+    @invalidates_hierarchy
     def dev_app_stop(self, package):
         """
         Stop the application based on the package name
@@ -633,6 +1496,7 @@ class DeviceActions(Actions):
         """
         self.device.app_stop(package)
 
+    @invalidates_hierarchy
     def dev_app_uninstall(self, package):
         """
         Uninstall the application based on the package name
@@ -644,6 +1508,8 @@ class DeviceActions(Actions):
         """
         self.device.app_uninstall(package)
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def dev_click_screen(self, x, y):
         """
         Click position
@@ -666,6 +1532,8 @@ class DeviceActions(Actions):
         """
         return self.device.app_current()
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def dev_double_click_screen(self, x, y):
         """
         Double click position
@@ -688,15 +1556,54 @@ class DeviceActions(Actions):
         """
         return self.device.dev_info
 
-    def dev_get_page_text(self) -> list:
+    def get_device_health(self, alias=None) -> dict:
         """
-        Gets all texts on the page
+        State of the background health probe of the device
+        :param alias: alias given to Connect Device, default is the current device
+        :return: dict of alive, failures, reconnects, last_seen and lost_since timestamps,
+            None if the device is connected without health_interval,
+            raise ConnectionError if no device is connected, ValueError if alias is not connected
+
+        Example:
+            | ${health} | Get Device Health
+            | Should Be True | ${health}[alive]
+        """
+        context = self._registry.get(alias) if alias else self._connected()
+        return context.health.state if context.health else None
+
+    def dev_get_page_text(self, class_name=None, package=None, bounds=None, unique: bool = False,
+                          description: bool = True, refresh: bool = True) -> list:
+        """
+        Gets all texts on the page, text and content-desc of every node in the hierarchy snapshot
+        :param class_name: only nodes of these classes, list or comma separated, default all
+        :param package: only nodes of these packages, list or comma separated, default all
+        :param bounds: left,top,right,bottom, only nodes whose center is in this area, default whole screen
+        :param unique: skip repeated texts
+        :param description: False skips content-desc
+        :param refresh: dump the hierarchy first, False reads the current snapshot, which is older than the screen
+            if the screen changed without a screen changing keyword, e.g. by a timer or an animation
         :return: text list
 
         Example:
             | @{variable} | Dev Get Page Text
-        """
-        return [ele.text for ele in self.device.xpath('//android.widget.TextView').all()]
+            or
+            | @{variable} | Dev Get Page Text | class_name=android.widget.TextView,android.widget.Button | unique=True
+            or
+            | @{variable} | Dev Get Page Text | bounds=0,200,1080,1600 | description=False
+            or
+            | @{variable} | Dev Get Page Text | refresh=False
+        """
+        if isinstance(class_name, str):
+            class_name = class_name.split(",")
+        if isinstance(package, str):
+            package = package.split(",")
+        if isinstance(bounds, str):
+            bounds = bounds.split(",")
+        if bounds is not None:
+            bounds = [int(value) for value in bounds]
+            assert len(bounds) == 4
+        source = self.hierarchy.refresh() if refresh else self.hierarchy.source
+        return list(iter_page_text(source, class_name, package, bounds, unique, description))
 
     def dev_get_toast_message(self) -> str or bool:
         """
@@ -706,8 +1613,94 @@ class DeviceActions(Actions):
         Example:
             | ${variable} | Dev Get Toast Message
         """
+        watcher = self._registry.current.toasts
+        if watcher is not None:
+            # the watcher clears the toast on the device, read the toasts of the last 10 seconds it collected
+            since = time.time() - 10
+            toasts = wait_until(lambda: watcher.toasts(since), 10, interval=0.1, max_interval=watcher.interval,
+                                description="toast").value
+            return toasts[-1][1] if toasts else None
         return self.device.toast.get_message()
 
+    def start_toast_watcher(self, interval: float = 0.5, size: int = 100):
+        """
+        Collect the toasts of the current device in background, so toast checks read the collected toasts
+        instead of racing the few seconds a toast is shown. Dev Get Toast Message reads them too while the
+        watcher runs
+        :param interval: seconds between polls of the device
+        :param size: newest toasts kept
+        :return:
+
+        Example:
+            | Start Toast Watcher
+            | ${mark} | Mark Toasts
+            | Click Element By Locator | text=Save
+            | Toast Should Have Appeared Since | Saved | ${mark} | timeout=3
+        """
+        self._registry.current.start_toast_watcher(float(interval), int(size))
+
+    def stop_toast_watcher(self) -> list:
+        """
+        Stop collecting the toasts of the current device
+        :return: messages collected, oldest first
+
+        Example:
+            | @{toasts} | Stop Toast Watcher
+        """
+        watcher = self._registry.current.stop_toast_watcher()
+        return [message for _, message in watcher.toasts()] if watcher else []
+
+    def _toast_watcher(self):
+        watcher = self._registry.current.toasts
+        if watcher is None:
+            raise AssertionError("Toast watcher is not started, use Start Toast Watcher")
+        return watcher
+
+    def mark_toasts(self) -> float:
+        """
+        Current time, to check the toasts shown after it
+        :return: epoch seconds
+
+        Example:
+            | ${mark} | Mark Toasts
+        """
+        return time.time()
+
+    def get_toasts(self, since: float = None) -> list:
+        """
+        Toasts collected by the toast watcher
+        :param since: mark of Mark Toasts, default every collected toast
+        :return: messages, oldest first
+
+        Example:
+            | @{toasts} | Get Toasts | ${mark}
+        """
+        return [message for _, message in self._toast_watcher().toasts(None if since is None else float(since))]
+
+    def toast_should_have_appeared_since(self, message, since: float = None, timeout: float = 0, exact: bool = False):
+        """
+        Assert a toast containing message was collected by the toast watcher after since
+        :param message: text of the toast, a part of it unless exact
+        :param since: mark of Mark Toasts, default since the watcher started
+        :param timeout: seconds to wait for the toast if it is not collected yet
+        :param exact: the whole toast must be message
+        :return: message of the toast
+
+        Example:
+            | Toast Should Have Appeared Since | Saved | ${mark}
+            or
+            | Toast Should Have Appeared Since | Saved successfully | ${mark} | timeout=3 | exact=True
+        """
+        watcher = self._toast_watcher()
+        since = None if since is None else float(since)
+        result = wait_until(lambda: watcher.find(message, since, exact), float(timeout), interval=0.1,
+                            max_interval=watcher.interval, description=f"toast {message}")
+        if not result:
+            start = time.strftime("%H:%M:%S", time.localtime(since or watcher.started))
+            raise AssertionError(f"No toast '{message}' since {start}, "
+                                 f"collected {[toast for _, toast in watcher.toasts(since)]}")
+        return result.value[1]
+
     def dev_get_window_size(self):
         """
         Gets window size
@@ -718,6 +1711,8 @@ class DeviceActions(Actions):
         """
         return self.device.window_size()
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def dev_long_click_screen(self, x, y, duration: float = 1):
         """
         Long click position
@@ -733,6 +1728,85 @@ class DeviceActions(Actions):
         """
         self.device.long_click(x, y, duration)
 
+    @stabilizes_screen
+    @invalidates_hierarchy
+    def dev_perform_gesture(self, gesture, duration: float = 0.5):
+        """
+        Perform a gesture with one device round trip: the steps are compiled to uiautomator2 server calls sent in one
+        JSON-RPC batch, the server runs them back to back so no network jitter gets between the steps.
+        Coordinates below 1 are relative to the screen size
+        :param gesture: list of points [x, y] swiped through in duration, e.g. a pattern lock or a drag path,
+            or list of step dict
+            {"action": "tap", "x": x, "y": y}
+            {"action": "hold", "x": x, "y": y, "duration": seconds}, long press
+            {"action": "swipe", "from": [x, y], "to": [x, y], "duration": seconds}
+            {"action": "path", "points": [[x, y], ...], "duration": seconds}, one finger through the points
+            {"action": "pinch", "direction": "in" or "out", "percent": 50, "duration": seconds, "locator": locator}
+            {"action": "two_fingers", "from": [[x1, y1], [x2, y2]], "to": [[x1, y1], [x2, y2]], "duration": seconds,
+            "locator": locator}
+            {"action": "wait", "duration": seconds}, sends the steps before it and sleeps
+            the duration of a step defaults to duration, locator is a kwargs locator dict of the element the
+            two finger gestures are performed on, default is the whole window
+        :param duration: seconds of a point list or of a step without duration
+        :return:
+
+        Example:
+            | Dev Perform Gesture | ${{[[200, 1200], [540, 1200], [540, 1500], [880, 1500]]}} | 0.8
+            or
+            &{tap}      action=tap      x=540    y=960
+            &{pinch}    action=pinch    direction=out    percent=60
+            | Dev Perform Gesture | ${{[$tap, $tap, $pinch]}}
+        """
+        batch = JsonRpcBatch(self.device)
+        rel2abs = self.device.pos_rel2abs
+
+        def steps_of(seconds, segments=1):
+            # one step of the uiautomator swipe is about 5ms
+            return max(1, int(float(seconds) * 200 / segments))
+
+        def flat(points):
+            return [value for point in points for value in rel2abs(*point)]
+
+        def point(position):
+            x, y = rel2abs(*position)
+            return {"x": x, "y": y}
+
+        if gesture and not isinstance(gesture[0], dict):
+            gesture = [{"action": "path", "points": gesture}]
+        for step in gesture:
+            action = step.get("action")
+            seconds = step.get("duration", duration)
+            if action == "tap":
+                batch.add("click", *rel2abs(step["x"], step["y"]))
+            elif action == "hold":
+                x, y = rel2abs(step["x"], step["y"])
+                batch.add("swipe", x, y, x, y, steps_of(seconds))
+            elif action == "swipe":
+                batch.add("swipe", *flat([step["from"], step["to"]]), steps_of(seconds))
+            elif action == "path":
+                points = step["points"]
+                batch.add("swipePoints", flat(points), steps_of(seconds, max(len(points) - 1, 1)))
+            elif action in ("pinch", "two_fingers"):
+                locator = step.get("locator") or {}
+                if not isinstance(locator, dict):
+                    raise TypeError(f"dev_perform_gesture() {action} locator must be a kwargs locator dict")
+                if action == "two_fingers":
+                    start, end = step["from"], step["to"]
+                    batch.add("gesture", u2.Selector(**locator), point(start[0]), point(start[1]), point(end[0]),
+                              point(end[1]), steps_of(seconds))
+                elif step.get("direction", "in") in ("in", "out"):
+                    method = "pinchIn" if step.get("direction", "in") == "in" else "pinchOut"
+                    batch.add(method, u2.Selector(**locator), int(step.get("percent", 50)), steps_of(seconds))
+                else:
+                    raise ValueError(f"Unknown pinch direction '{step['direction']}', use in or out")
+            elif action == "wait":
+                batch.send()
+                time.sleep(float(seconds))
+            else:
+                raise TypeError(f"dev_perform_gesture() unsupported step {step}")
+        batch.send()
+
+    @invalidates_hierarchy
     def dev_press_key(self, key):
         """
         Simulate press key via name or key code. Supported key name includes:
@@ -749,36 +1823,114 @@ class DeviceActions(Actions):
                        "delete", "del", "recent", "volume_up", "volume_down", "volume_mute", "camera", "power"]
         return self.device.press(key)
 
-    def dev_screenshot(self, filename):
-        """
-        Save screenshot to filename
-        :param filename: file path and name
+    def dev_configure_screenshots(self, asynchronous: bool = True, image_format="png", quality: int = 90,
+                                  buffer_size: int = 10, workers: int = 2):
+        """
+        Configure the screenshot capture of the current device, in asynchronous mode Dev Screenshot returns
+        as soon as the device sent the image, encoding and writing are done by background threads,
+        the last frames are kept in memory and a frame identical to the previous one is not saved again
+        :param asynchronous: False saves screenshots in the keyword thread
+        :param image_format: png, jpeg or raw, raw writes the JPEG bytes sent by the device without encoding
+        :param quality: jpeg quality 1-95
+        :param buffer_size: number of frames kept in memory
+        :param workers: number of encoding threads
         :return:
 
+        Example:
+            | Dev Configure Screenshots |
+            or
+            | Dev Configure Screenshots | image_format=jpeg | quality=80 | buffer_size=20
+        """
+        pipeline = self._registry.current.screenshots
+        pipeline.configure(image_format, quality, buffer_size, workers)
+        pipeline.asynchronous = asynchronous
+
+    def dev_flush_screenshots(self, directory, prefix="screenshot") -> list:
+        """
+        Write the screenshots kept in memory to directory and empty the buffer
+        :param directory: output directory
+        :param prefix: file name prefix
+        :return: list of file paths
+
+        Example:
+            | ${files} | Dev Flush Screenshots | ${OUTPUT_DIR}/screenshots
+        """
+        return self._registry.current.screenshots.flush(directory, prefix)
+
+    def dev_screenshot(self, filename=None):
+        """
+        Save screenshot to filename, in asynchronous mode (see Dev Configure Screenshots) the file is written
+        in background and the extension follows the configured format
+        :param filename: file path and name, in asynchronous mode default only keeps the frame in memory
+        :return: file path, None in asynchronous mode without filename
+
         Example:
             | Dev Screenshot | C:\\Users\\screenshot.png
+            or
+            | Dev Configure Screenshots |
+            | Dev Screenshot |
         """
-        return self.device.screenshot(filename)
+        pipeline = self._registry.current.screenshots
+        if not pipeline.asynchronous:
+            return self.device.screenshot(filename)
+        return pipeline.capture(self.device, filename)
 
-    def dev_scroll_to_deep_end(self):
+    def dev_wait_screenshots(self):
         """
-        need test
-        At the end of the scroll page, if the list loads the content, the load is scrolled until the last record
+        Wait the screenshots being written in background, fail if one of them could not be written
         :return:
 
         Example:
-            | Dev Scroll To Deep End |
+            | Dev Wait Screenshots |
         """
-        a_txt = []
-        while True:
-            self.device(scrollable=False).scroll.toEnd()
-            sleep(3)
-            b_txt = self.dev_get_page_text()
-            if len(list(set(b_txt).difference(set(a_txt)))) == 0:
-                break
-            else:
-                a_txt = b_txt
+        with metrics.waiting():
+            self._registry.current.screenshots.wait()
 
+    @invalidates_hierarchy
+    def dev_scroll_to_deep_end(self, max_iterations: int = 50, timeout: float = 300, settle_timeout: float = 3) -> dict:
+        """
+        At the end of the scroll page, if the list loads the content, the load is scrolled until the last record.
+        After each scroll the hierarchy is dumped until two dumps are identical, the list is at the end
+        when the settled page is the same as before the scroll
+        :param max_iterations: max number of scrolls
+        :param timeout: max seconds spent scrolling
+        :param settle_timeout: max seconds waited for the page to stop changing after a scroll
+        :return: dict of pages (new pages loaded), iterations, elapsed, settle (seconds waited) and reached_end
+
+        Example:
+            | Dev Scroll To Deep End |
+            or
+            | ${stats} | Dev Scroll To Deep End | max_iterations=20 | timeout=60
+        """
+        start = time.perf_counter()
+        stats = {"pages": 0, "iterations": 0, "elapsed": 0.0, "settle": 0.0, "reached_end": False}
+        previous = hierarchy_digest(self.hierarchy.source)
+        while stats["iterations"] < max_iterations:
+            remaining = timeout - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            self.device(scrollable=True).scroll.toEnd()
+            stats["iterations"] += 1
+            digests = []
+
+            def settled():
+                digests.append(hierarchy_digest(self.hierarchy.refresh()))
+                return len(digests) > 1 and digests[-1] == digests[-2]
+
+            result = wait_until(settled, min(settle_timeout, max(remaining, 0)), interval=0.2, max_interval=1.0,
+                                description="page settled")
+            stats["settle"] += result.elapsed
+            if digests[-1] == previous:
+                stats["reached_end"] = True
+                break
+            stats["pages"] += 1
+            previous = digests[-1]
+        stats["elapsed"] = round(time.perf_counter() - start, 3)
+        stats["settle"] = round(stats["settle"], 3)
+        logger.info("scroll to deep end: %s", stats)
+        return stats
+
+    @invalidates_hierarchy
     def dev_show_float_window(self):
         """
         Display suspension window to improve the stability of uiAutomator running
@@ -789,6 +1941,7 @@ class DeviceActions(Actions):
         """
         self.device.show_float_window()
 
+    @invalidates_hierarchy
     def dev_swipe_screen(self, fx, fy, tx, ty, steps=55):
         """
         Swipe screen
@@ -804,6 +1957,7 @@ class DeviceActions(Actions):
         """
         self.device.swipe(fx, fy, tx, ty, steps=steps)
 
+    @invalidates_hierarchy
     def dev_turn_screen(self, status):
         """
         Turn screen
@@ -827,16 +1981,65 @@ class DeviceActions(Actions):
         Example:
             | Dev Wait Activity | com.android.activity.DemoActivity
         """
-        if self.device.wait_activity(activity):
+        with metrics.waiting():
+            shown = self.device.wait_activity(activity)
+        if shown:
             return True
         else:
             raise TimeoutError
 
 
+@instrumented
 class XpathActions(Actions):
     def __init__(self):
         super(XpathActions, self).__init__()
 
+    def _xpath_selector(self, xpath, timeout=10):
+        """
+        Gets xpath selector bound to the hierarchy snapshot, the current snapshot is read first and the hierarchy
+        is dumped again until xpath matches or timeout, timeout 0 reads the current snapshot once
+        :param xpath: xpath string
+        :param timeout: default is 10 second
+        :return: XPathSelector, raise XPathElementNotFoundError
+        """
+        def match(hierarchy):
+            selector = self.device.xpath(xpath, hierarchy.source)
+            return selector if selector.all() else None
+
+        if float(timeout) > 0:
+            selector = self._poll_hierarchy(match, timeout=timeout)
+        else:
+            selector = match(self.hierarchy)
+        if selector is None:
+            raise u2.xpath.XPathElementNotFoundError(xpath)
+        return selector
+
+    def _xpath_wait(self, xpath, timeout=10, gone=False) -> bool:
+        """
+        Wait xpath show on page or disappear, each poll reads the hierarchy snapshot once
+        :param xpath: xpath string
+        :param timeout: default is 10 second
+        :param gone: wait disappear if True
+        :return: bool
+        """
+        return self._poll_hierarchy(lambda hierarchy: bool(self.device.xpath(xpath, hierarchy.source).all()) != gone,
+                                    timeout=timeout, fresh=gone)
+
+    def refresh_hierarchy(self):
+        """
+        Dump the hierarchy snapshot again, keywords reading elements without waiting (xpath keywords with
+        timeout 0, Get Elements Attributes without timeout) read the snapshot until a screen changing keyword
+        (click, set text, swipe, press key, app start/stop) is called, waiting keywords read it first and dump it
+        again while the element is not found, waits on an element to be gone dump it first
+        :return:
+
+        Example
+            | Refresh Hierarchy
+        """
+        self.hierarchy.refresh()
+
+    @stabilizes_screen
+    @invalidates_hierarchy
     def click_element_by_xpath(self, xpath, timeout=10):
         """
         Click element by xpath
@@ -853,9 +2056,13 @@ class XpathActions(Actions):
         """
         if isinstance(xpath, u2.xpath.XMLElement):
             xpath.click()
+        elif self._registry.current.coordinates is not None:
+            self._click_cached(xpath, lambda: self.find_element_by_xpath(xpath, timeout=timeout).center())
         else:
             self.find_element_by_xpath(xpath, timeout=timeout).click()
 
+    @stabilizes_screen
+    @invalidates_hierarchy
     def long_click_element_by_xpath(self, xpath, timeout=10):
         """
         Long click element by xpath
@@ -887,8 +2094,7 @@ class XpathActions(Actions):
             or
             | ${variable} | Element Is Existed By Xpath | //*[@resource-id="com.android.demo:id/login"] | 5
         """
-        if self.find_element_by_xpath(xpath, timeout=timeout):
-            return self.device.xpath(xpath).exists
+        return self._xpath_selector(xpath, timeout=timeout).exists
 
     def find_element_by_xpath(self, xpath, timeout=10):
         """
@@ -902,7 +2108,7 @@ class XpathActions(Actions):
             or
             | ${variable} | Find Element By Xpath | //*[@resource-id="com.android.demo:id/login"] | 5
         """
-        return self.device.xpath(xpath).get(timeout=timeout)
+        return self._xpath_selector(xpath, timeout=timeout).get()
 
     def find_elements_by_xpath(self, xpath, timeout=10):
         """
@@ -916,8 +2122,52 @@ class XpathActions(Actions):
             or
             | @{variable} | Find Elements By Xpath | //*[@resource-id="com.android.demo:id/login"] | 5
         """
-        if self.find_element_by_xpath(xpath, timeout=timeout):
-            return self.device.xpath(xpath).all()
+        return self._xpath_selector(xpath, timeout=timeout).all()
+
+    def iter_elements_by_xpath(self, xpath, max_pages: int = 50, timeout=10, scroll: bool = True):
+        """
+        Lazily iterate the elements matching xpath in a long list, page by page: the elements of the hierarchy
+        snapshot are yielded, then the scrollable container is scrolled forward and the new elements are yielded,
+        until a scroll does not change the page any more, the page has no scrollable container, max_pages scrolls
+        or the loop stops.
+        Elements still shown from the previous page, found by matching the tail of the previous page with the head
+        of the new page in order, are not yielded again, only one page is held in memory.
+        Use FOR IN ZIP with mode=SHORTEST in Robot Framework, FOR IN @{list} reads the whole list first
+        :param xpath: xpath string
+        :param max_pages: max number of scrolls
+        :param timeout: max seconds to wait for the first element, default is 10 second
+        :param scroll: False only iterates the current page
+        :return: generator of XMLElement
+
+        Example
+            | ${rows} | Iter Elements By Xpath | //*[@resource-id="com.android.demo:id/title"]
+            | FOR | ${row} | IN ZIP | ${rows} | mode=SHORTEST
+            |     | Log | ${row.text}
+            |     | IF | $row.text == "Last" | BREAK
+            | END
+        """
+        self._xpath_selector(xpath, timeout=timeout)
+        previous = []
+        pages = 0
+        while True:
+            source = self.hierarchy.source
+            elements = self.device.xpath(xpath, source).all()
+            current = [(element.elem.tag, element.attrib.get("resource-id"), element.attrib.get("text"),
+                        element.attrib.get("content-desc")) for element in elements]
+            # the head of the page repeating the tail of the previous page, in order, is what the scroll left
+            for element in elements[page_overlap(previous, current):]:
+                yield element
+            if not scroll or pages >= int(max_pages) or not self.hierarchy.index.exists(scrollable=True):
+                return
+            try:
+                self.device(scrollable=True).scroll.forward()
+            except u2.UiObjectNotFoundError:
+                # the scrollable container went away since the snapshot
+                return
+            pages += 1
+            if hierarchy_digest(self.hierarchy.refresh()) == hierarchy_digest(source):
+                return
+            previous = current
 
     def find_parent_element_by_xpath(self, xpath, timeout=10):
         """
@@ -992,9 +2242,9 @@ class XpathActions(Actions):
         if isinstance(xpath, u2.xpath.XMLElement):
             return xpath.text()
         else:
-            if self.find_element_by_xpath(xpath, timeout=timeout):
-                return self.device.xpath(xpath).get_text()
+            return self._xpath_selector(xpath, timeout=timeout).get_text()
 
+    @invalidates_hierarchy
     def set_element_text_by_xpath(self, xpath, text, timeout=10):
         """
         Sets element text by xpath
@@ -1008,8 +2258,8 @@ class XpathActions(Actions):
             or
             | Set Element Text By Xpath | //*[@resource-id="com.android.demo:id/login"] | text | 5
         """
-        if self.find_element_by_xpath(xpath, timeout=timeout):
-            self.device.xpath(xpath).set_text(text)
+        selector = self._xpath_selector(xpath, timeout=timeout)
+        self._input_text(text, lambda: selector.get().click(), lambda: selector.set_text(text))
 
     def wait_element_visible_by_xpath(self, xpath, timeout=10):
         """
@@ -1022,7 +2272,7 @@ class XpathActions(Actions):
             or
             | Wait Element Visible By Xpath | //*[@resource-id="com.android.demo:id/login"] | text | 5
         """
-        if self.device.xpath(xpath).wait(timeout):
+        if self._xpath_wait(xpath, timeout=timeout):
             return True
         else:
             raise TimeoutError
@@ -1038,7 +2288,7 @@ class XpathActions(Actions):
             or
             | Wait Element Invisible By Xpath | //*[@resource-id="com.android.demo:id/login"] | text | 5
         """
-        if self.device.xpath(xpath).wait_gone(timeout):
+        if self._xpath_wait(xpath, timeout=timeout, gone=True):
             return True
         else:
             raise TimeoutError
@@ -0,0 +1,60 @@
+# -*- coding:utf-8 -*-
+import time
+
+from .logger import logger
+from .metrics import metrics
+
+
+class WaitResult(object):
+    """
+    Outcome of a wait: the last value of the condition, the time the wait actually used and the part of it
+    spent sleeping between two polls
+    """
+
+    def __init__(self, value, elapsed, attempts, slept=0.0):
+        self.value = value
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.slept = slept
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __repr__(self):
+        return f"WaitResult(value={self.value!r}, elapsed={self.elapsed:.3f}, attempts={self.attempts}, " \
+               f"slept={self.slept:.3f})"
+
+
+def wait_until(condition, timeout, interval=0.1, max_interval=1.0, backoff=1.5, description=None) -> WaitResult:
+    """
+    Poll condition until it returns a truthy value or the deadline passes,
+    the poll interval grows by backoff up to max_interval and never sleeps past the deadline,
+    only the sleeps are counted as wait time in metrics, the polls are counted as execution
+    :param condition: callable without argument
+    :param timeout: max wait seconds, 0 evaluates condition once
+    :param interval: first poll interval seconds
+    :param max_interval: max poll interval seconds
+    :param backoff: factor the interval grows by after each poll
+    :param description: what is waited for, used in the report
+    :return: WaitResult
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    attempts = 1
+    slept = 0.0
+    value = condition()
+    while not value:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        asleep = time.perf_counter()
+        time.sleep(min(interval, remaining))
+        slept += time.perf_counter() - asleep
+        interval = min(interval * backoff, max_interval)
+        attempts += 1
+        value = condition()
+    result = WaitResult(value, time.perf_counter() - start, attempts, slept)
+    metrics.add_wait(result.slept)
+    logger.debug("wait %s %s after %.3fs/%ss, %d attempts", description or condition,
+                 "met" if value else "timed out", result.elapsed, timeout, attempts)
+    return result
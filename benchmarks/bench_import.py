@@ -0,0 +1,50 @@
+# -*- coding:utf-8 -*-
+"""
+Startup benchmark: time to import the library compared with importing uiautomator2 eagerly,
+every sample runs in a fresh interpreter
+
+Usage:
+    python benchmarks/bench_import.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, int("uiautomator2" in sys.modules))
+"""
+
+
+def sample(module) -> tuple:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""), U2LIB_LOG_DIR="")
+    output = subprocess.check_output([sys.executable, "-c", SNIPPET.format(module=module)], env=env, cwd=ROOT)
+    elapsed, loaded = output.split()
+    return float(elapsed), bool(int(loaded))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    report = {}
+    for name, module in (("library", "Uiautomator2Library"), ("uiautomator2", "uiautomator2"),
+                         ("library + uiautomator2", "Uiautomator2Library, uiautomator2")):
+        samples = [sample(module) for _ in range(args.runs)]
+        times = [elapsed for elapsed, _ in samples]
+        report[name] = {"median_ms": round(statistics.median(times) * 1000, 2),
+                        "min_ms": round(min(times) * 1000, 2),
+                        "uiautomator2_loaded": samples[-1][1]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# -*- coding:utf-8 -*-
+"""
+Keyword benchmark: runs keywords of UiActions, DeviceActions and XpathActions against a local stub uiautomator2
+server with injected latency and hierarchy size, and reports per keyword the median wall time, the device HTTP
+requests and the peak memory allocated. The hierarchy snapshot is dropped before every run, as after a screen
+change in a real test
+
+Usage:
+    python benchmarks/bench_keywords.py [--nodes 100,1000,10000] [--latency 0.005] [--runs 5]
+                                        [--locator-mode remote] [--output result.json]
+                                        [--compare baseline.json] [--threshold 0.2]
+
+With --compare the result is compared with a previous --output file, the exit code is 1 if a keyword got slower
+than threshold or sends more requests
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("U2LIB_LOG_DIR", "")
+os.environ.setdefault("U2LIB_LOG_CONSOLE", "0")
+
+from stub_server import StubServer  # noqa: E402
+from Uiautomator2Library import Uiautomator2Library  # noqa: E402
+
+USERNAME = {"resourceId": "com.demo:id/username"}
+LOGIN = {"text": "Login"}
+LOGIN_XPATH = '//*[@resource-id="com.demo:id/login"]'
+
+
+def cases(screenshot_dir):
+    """
+    :return: list of (keyword class, keyword, callable with library argument)
+    """
+    return [
+        ("UiActions", "Click Element By Locator", lambda lib: lib.click_element_by_locator(**LOGIN)),
+        ("UiActions", "Element Is Existed By Locator", lambda lib: lib.element_is_existed_by_locator(**LOGIN)),
+        ("UiActions", "Execute Batch", lambda lib: lib.execute_batch([
+            {"action": "set_text", "locator": USERNAME, "text": "admin"},
+            {"action": "get_attribute", "locator": LOGIN, "attribute": "text"},
+            {"action": "click", "locator": LOGIN}])),
+        ("UiActions", "Find Element By Locator", lambda lib: lib.find_element_by_locator(**LOGIN)),
+        ("UiActions", "Get Element Attribute By Locator",
+         lambda lib: lib.get_element_attribute_by_locator("text", **LOGIN)),
+        ("UiActions", "Get Element Text By Locator", lambda lib: lib.get_element_text_by_locator(**LOGIN)),
+        ("UiActions", "Get Elements Count By Locator",
+         lambda lib: lib.get_elements_count_by_locator(resourceId="com.demo:id/title")),
+        ("UiActions", "Set Element Text By Locator", lambda lib: lib.set_element_text_by_locator("admin", **USERNAME)),
+        ("UiActions", "Wait Element Visible By Locator", lambda lib: lib.wait_element_visible_by_locator(**LOGIN)),
+        ("DeviceActions", "Dev Click Screen", lambda lib: lib.dev_click_screen(540, 960)),
+        ("DeviceActions", "Dev Get Page Text", lambda lib: lib.dev_get_page_text()),
+        ("DeviceActions", "Dev Get Window Size", lambda lib: lib.dev_get_window_size()),
+        ("DeviceActions", "Dev Press Key", lambda lib: lib.dev_press_key("back")),
+        ("DeviceActions", "Dev Screenshot",
+         lambda lib: lib.dev_screenshot(os.path.join(screenshot_dir, "screenshot.jpg"))),
+        ("DeviceActions", "Dev Swipe Screen", lambda lib: lib.dev_swipe_screen(600, 800, 600, 80, 10)),
+        ("XpathActions", "Click Element By Xpath", lambda lib: lib.click_element_by_xpath(LOGIN_XPATH)),
+        ("XpathActions", "Element Is Existed By Xpath", lambda lib: lib.element_is_existed_by_xpath(LOGIN_XPATH)),
+        ("XpathActions", "Find Elements By Xpath",
+         lambda lib: lib.find_elements_by_xpath('//*[@resource-id="com.demo:id/title"]')),
+        ("XpathActions", "Get Element Text By Xpath", lambda lib: lib.get_element_text_by_xpath(LOGIN_XPATH)),
+        ("XpathActions", "Set Element Text By Xpath",
+         lambda lib: lib.set_element_text_by_xpath('//*[@resource-id="com.demo:id/username"]', "admin")),
+    ]
+
+
+def measure(lib, stub, run, runs) -> dict:
+    """
+    Times runs without tracing, tracemalloc slows CPU bound keywords much more than I/O bound ones,
+    then measures the peak memory in one more run which is not timed
+    :return: median wall time ms, device requests of one run, peak memory KiB of the traced run
+    """
+    times, requests = [], []
+    for _ in range(runs):
+        lib.hierarchy.invalidate()
+        before = stub.requests
+        start = time.perf_counter()
+        run(lib)
+        times.append(time.perf_counter() - start)
+        requests.append(stub.requests - before)
+    lib.hierarchy.invalidate()
+    tracemalloc.start()
+    run(lib)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"time_ms": round(statistics.median(times) * 1000, 3), "requests": max(requests),
+            "peak_kib": round(peak / 1024, 1)}
+
+
+def benchmark(nodes, latency, runs, locator_mode) -> dict:
+    stub = StubServer(nodes=nodes, latency=latency)
+    lib = Uiautomator2Library()
+    lib.connect_device(stub.start(), f"stub-{nodes}")
+    lib.set_locator_mode(locator_mode)
+    report = {}
+    try:
+        with tempfile.TemporaryDirectory() as screenshot_dir:
+            for keyword_class, keyword, run in cases(screenshot_dir):
+                # first run warms up the connection and lazy imports
+                run(lib)
+                report[f"{keyword_class}.{keyword}"] = measure(lib, stub, run, runs)
+    finally:
+        lib.disconnect_device()
+        stub.stop()
+    return report
+
+
+def compare(result, baseline, threshold) -> list:
+    """
+    :return: list of regression messages
+    """
+    regressions = []
+    for nodes, keywords in result["results"].items():
+        for keyword, current in keywords.items():
+            previous = baseline.get("results", {}).get(nodes, {}).get(keyword)
+            if previous is None:
+                continue
+            ratio = current["time_ms"] / previous["time_ms"] if previous["time_ms"] else 1
+            current["time_ratio"] = round(ratio, 3)
+            if ratio > 1 + threshold:
+                regressions.append(f"{nodes} nodes {keyword}: {previous['time_ms']} ms -> {current['time_ms']} ms")
+            if current["requests"] > previous["requests"]:
+                regressions.append(f"{nodes} nodes {keyword}: {previous['requests']} -> {current['requests']} requests")
+    return regressions
+
+
+def print_table(result):
+    for nodes, keywords in result["results"].items():
+        print(f"\n{nodes} nodes, latency {result['latency'] * 1000:g} ms, locator mode {result['locator_mode']}")
+        print(f"{'keyword':<50} {'time ms':>10} {'requests':>9} {'peak KiB':>10} {'ratio':>7}")
+        for keyword, stats in keywords.items():
+            print(f"{keyword:<50} {stats['time_ms']:>10} {stats['requests']:>9} {stats['peak_kib']:>10} "
+                  f"{stats.get('time_ratio', ''):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", default="100,1000,10000", help="comma separated hierarchy sizes")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every device request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--locator-mode", default="remote", choices=("remote", "local"))
+    parser.add_argument("--output", help="write the result to this json file")
+    parser.add_argument("--compare", help="json file written by --output of a previous version")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio, default 0.2")
+    args = parser.parse_args()
+    result = {"latency": args.latency, "runs": args.runs, "locator_mode": args.locator_mode,
+              "python": sys.version.split()[0], "results": {}}
+    for nodes in [int(value) for value in args.nodes.split(",")]:
+        result["results"][str(nodes)] = benchmark(nodes, args.latency, args.runs, args.locator_mode)
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+    print_table(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if regressions:
+        print("\nRegressions:")
+        print("\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
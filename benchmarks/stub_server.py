@@ -0,0 +1,179 @@
+# -*- coding:utf-8 -*-
+"""
+Local stand-in of the uiautomator2 server for benchmarks: answers JSON-RPC calls, batches, /info, /shell and
+/screenshot with a generated hierarchy of a given size after an injected latency
+"""
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+NODE = ('<node index="{index}" text="{text}" resource-id="{rid}" class="{cls}" package="com.demo" '
+        'content-desc="{desc}" checkable="false" checked="false" clickable="{clickable}" enabled="true" '
+        'focusable="true" focused="false" scrollable="{scrollable}" long-clickable="false" password="false" '
+        'selected="false" visible-to-user="true" bounds="[{left},{top}][{right},{bottom}]"')
+
+
+def build_hierarchy(nodes) -> str:
+    """
+    Hierarchy xml of a login form above a scrollable list, nodes counts every node of the hierarchy
+    :param nodes: total number of nodes, at least 6
+    :return: xml string
+    """
+    parts = ["<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>", '<hierarchy rotation="0">',
+             NODE.format(index=0, text="", rid="", cls="android.widget.FrameLayout", desc="", clickable="false",
+                         scrollable="false", left=0, top=0, right=1080, bottom=1920) + ">"]
+    for index, (text, rid, cls) in enumerate((("user", "com.demo:id/username", "android.widget.EditText"),
+                                              ("", "com.demo:id/password", "android.widget.EditText"),
+                                              ("Login", "com.demo:id/login", "android.widget.Button"))):
+        parts.append(NODE.format(index=index, text=text, rid=rid, cls=cls, desc="", clickable="true",
+                                 scrollable="false", left=100, top=200 + index * 150, right=980,
+                                 bottom=300 + index * 150) + " />")
+    parts.append(NODE.format(index=3, text="", rid="com.demo:id/list", cls="androidx.recyclerview.widget.RecyclerView",
+                             desc="", clickable="false", scrollable="true", left=0, top=700, right=1080,
+                             bottom=1920) + ">")
+    items = max(nodes - 5, 0)
+    for index in range(items):
+        # every item is a row layout holding a title, two nodes per item
+        top = 700 + (index // 2) * 120 % 1100
+        if index % 2 == 0:
+            parts.append(NODE.format(index=index // 2, text="", rid="com.demo:id/row", cls="android.widget.LinearLayout",
+                                     desc=f"row {index // 2}", clickable="true", scrollable="false", left=0, top=top,
+                                     right=1080, bottom=top + 120) + ">")
+        else:
+            parts.append(NODE.format(index=0, text=f"Item {index // 2}", rid="com.demo:id/title",
+                                     cls="android.widget.TextView", desc="", clickable="false", scrollable="false",
+                                     left=20, top=top, right=1060, bottom=top + 120) + " />")
+            parts.append("</node>")
+    if items % 2:
+        parts.append("</node>")
+    parts += ["</node>", "</node>", "</hierarchy>"]
+    return "\n".join(parts)
+
+
+def build_screenshot() -> bytes:
+    """
+    :return: JPEG bytes of a 1080x1920 image
+    """
+    from PIL import Image
+    output = io.BytesIO()
+    Image.new("RGB", (1080, 1920), (30, 120, 200)).save(output, "JPEG")
+    return output.getvalue()
+
+
+class StubServer(object):
+    """
+    Threaded HTTP server answering like the uiautomator2 server, requests counts every HTTP request
+    """
+    OBJECT_INFO = {"bounds": {"left": 100, "top": 500, "right": 980, "bottom": 600}, "childCount": 0,
+                   "className": "android.widget.Button", "contentDescription": "", "packageName": "com.demo",
+                   "resourceName": "com.demo:id/login", "text": "Login", "checkable": False, "checked": False,
+                   "clickable": True, "enabled": True, "focusable": True, "focused": False, "longClickable": False,
+                   "scrollable": False, "selected": False,
+                   "visibleBounds": {"left": 100, "top": 500, "right": 980, "bottom": 600}}
+    DEVICE_INFO = {"currentPackageName": "com.demo", "displayHeight": 1920, "displayWidth": 1080,
+                   "displayRotation": 0, "displaySizeDpX": 411, "displaySizeDpY": 731, "naturalOrientation": True,
+                   "productName": "stub", "screenOn": True, "sdkInt": 30}
+
+    def __init__(self, nodes=100, latency=0.0, host="127.0.0.1", port=0):
+        self.hierarchy = build_hierarchy(nodes)
+        self.screenshot = build_screenshot()
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="u2-stub", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def result(self, method, params):
+        """ Answer of one JSON-RPC call """
+        if method == "dumpWindowHierarchy":
+            return self.hierarchy
+        if method == "deviceInfo":
+            return self.DEVICE_INFO
+        if method in ("objInfo", "getChild", "getFromParent"):
+            return self.OBJECT_INFO if method == "objInfo" else "stub-object"
+        if method == "count":
+            return 1
+        if method in ("getLastToast", "getClipboard"):
+            return None
+        if method == "waitUntilGone":
+            return False
+        return True
+
+    def shell(self, command):
+        """ Output of a shell command, com.demo/.MainActivity has the focus and the fast input IME is shown """
+        if command.startswith("dumpsys input_method"):
+            return "mCurMethodId=com.github.uiautomator/.FastInputIME\nmInputShown=true\n"
+        if command.startswith("dumpsys window"):
+            return ("    init=1080x1920 420dpi cur=1080x1920 app=1080x1794 rng=1080x1017-1794x1731\n"
+                    "  mCurrentFocus=Window{5e1b2f0 u0 com.demo/com.demo.MainActivity}\n")
+        return ""
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+def _handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self, payload, content_type="application/json"):
+            if stub.latency:
+                time.sleep(stub.latency)
+            if not isinstance(payload, bytes):
+                payload = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            stub.count()
+            if self.path.startswith("/screenshot"):
+                self._reply(stub.screenshot, "image/jpeg")
+            elif self.path == "/info":
+                self._reply({"display": {"width": 1080, "height": 1920}, "serial": "stub"})
+            else:
+                self._reply(b"0.10.0", "text/plain")
+
+        def do_POST(self):
+            stub.count()
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path == "/shell":
+                self._reply({"output": stub.shell(parse_qs(body.decode("utf-8")).get("command", [""])[0]),
+                             "exitCode": 0})
+                return
+            if self.path != "/jsonrpc/0":
+                self._reply(b"", "text/plain")
+                return
+            calls = json.loads(body)
+
+            def answer(call):
+                return {"jsonrpc": "2.0", "id": call.get("id"),
+                        "result": stub.result(call.get("method"), call.get("params"))}
+
+            self._reply([answer(call) for call in calls] if isinstance(calls, list) else answer(calls))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,31 @@
+# -*- coding:utf-8 -*-
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("U2LIB_LOG_DIR", "")
+os.environ.setdefault("U2LIB_LOG_CONSOLE", "0")
+
+
+@pytest.fixture
+def stub():
+    """ StubServer of the benchmarks, started and stopped around the test """
+    from stub_server import StubServer
+    server = StubServer(20)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def library(stub):
+    """ Uiautomator2Library connected to the stub server """
+    from Uiautomator2Library import Uiautomator2Library
+    lib = Uiautomator2Library()
+    lib.connect_device(stub.url, "stub")
+    yield lib
+    lib.disconnect_device()
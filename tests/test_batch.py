@@ -0,0 +1,115 @@
+# -*- coding:utf-8 -*-
+import json
+
+import pytest
+
+from Uiautomator2Library.batch import JsonRpcBatch
+from Uiautomator2Library.lazy import u2
+
+
+class Response(object):
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self.payload
+
+
+class Http(object):
+    """ requests session of a device answering batch requests with answer(calls) """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.bodies = []
+
+    def post(self, path, headers=None, data=None, timeout=None):
+        self.bodies.append(json.loads(data))
+        return self.answer(self.bodies[-1])
+
+
+class Jsonrpc(object):
+    """ jsonrpc of a device answering one call at a time """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        return lambda *params: self.calls.append((method, params)) or method
+
+
+class Device(object):
+    def __init__(self, answer):
+        self.http = Http(answer)
+        self.jsonrpc = Jsonrpc()
+
+
+def echo(calls):
+    # answered in reverse order, results are matched by id
+    return Response([{"jsonrpc": "2.0", "id": call["id"], "result": call["method"]} for call in reversed(calls)])
+
+
+def test_batch_encoding():
+    device = Device(echo)
+    batch = JsonRpcBatch(device)
+    assert batch.add("click", 10, 20) == 0
+    assert batch.add("setText", u2.Selector(focused=True), "admin") == 1
+    assert batch.add("pressKeyCode", 66) == 2
+    assert len(batch) == 3
+    assert batch.send() == ["click", "setText", "pressKeyCode"]
+    body = device.http.bodies[0]
+    assert [call["id"] for call in body] == [1, 2, 3]
+    assert body[0] == {"jsonrpc": "2.0", "id": 1, "method": "click", "params": [10, 20]}
+    assert body[1]["params"][0]["focused"] is True and body[1]["params"][1] == "admin"
+    assert len(batch) == 0 and batch.send() == []
+    assert len(device.http.bodies) == 1
+
+
+def test_batch_without_server_support():
+    device = Device(lambda calls: Response(ValueError("not json"), 500))
+    batch = JsonRpcBatch(device)
+    batch.add("click", 1, 2)
+    batch.add("pressKey", "back")
+    assert batch.send() == ["click", "pressKey"]
+    assert device.jsonrpc.calls == [("click", (1, 2)), ("pressKey", ("back",))]
+
+
+def test_batch_error():
+    def answer(calls):
+        return Response([{"jsonrpc": "2.0", "id": 1, "error": {"code": -32002, "message": "not found"}}])
+
+    batch = JsonRpcBatch(Device(answer))
+    batch.add("setText", u2.Selector(text="user"), "admin")
+    with pytest.raises(u2.JSONRPCError):
+        batch.send()
+
+
+def test_execute_batch_operations(library, stub):
+    calls = []
+    answer = stub.result
+
+    def result(method, params):
+        calls.append((method, params))
+        return answer(method, params)
+
+    stub.result = result
+    requests = stub.requests
+    results = library.execute_batch([
+        {"action": "set_text", "locator": {"resourceId": "com.demo:id/username"}, "text": "admin"},
+        {"action": "set_text", "locator": '//*[@resource-id="com.demo:id/password"]', "text": 42},
+        {"action": "get_attribute", "locator": {"text": "Login"}, "attribute": "className"},
+        {"action": "click", "locator": {"text": "Login"}},
+        {"action": "press_key", "key": "66"},
+        {"action": "press_key", "key": "back"},
+    ])
+    assert results[2] == "android.widget.Button"
+    methods = [method for method, _ in calls if method != "dumpWindowHierarchy"]
+    assert methods == ["setText", "click", "setText", "click", "pressKeyCode", "pressKey"]
+    assert calls[-1][1] == ["back"] and calls[-2][1] == [66]
+    assert [params[1] for method, params in calls if method == "setText"] == ["admin", "42"]
+    # one dump and one batch
+    assert stub.requests - requests == 2
+    with pytest.raises(TypeError):
+        library.execute_batch([{"action": "swipe"}])
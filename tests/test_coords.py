@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+import pytest
+
+from Uiautomator2Library import Uiautomator2Library
+from Uiautomator2Library.coords import CoordinateCache, locator_key, screen_state
+
+
+class ShellDevice(object):
+    def __init__(self, output):
+        self.output = output
+
+    def shell(self, command):
+        return self.output, 0
+
+
+def test_screen_state():
+    device = ShellDevice("    init=1080x1920 420dpi cur=1080x1920 app=1080x1794\n"
+                         "  mCurrentFocus=Window{5e1b2f0 u0 com.demo/com.demo.MainActivity}\n")
+    assert screen_state(device) == ("com.demo/com.demo.MainActivity", "1080x1920")
+    assert screen_state(ShellDevice("  mCurrentFocus=null\n")) is None
+
+
+def test_locator_key_ignores_order():
+    assert locator_key({"text": "A", "className": "B"}) == locator_key({"className": "B", "text": "A"})
+
+
+def test_cache_drops_entries_on_size_change():
+    cache = CoordinateCache()
+    cache.put(("a", "1080x1920"), {"text": "A"}, (1, 2))
+    assert cache.get(("a", "1080x1920"), {"text": "A"}) == (1, 2)
+    assert cache.get(("a", "1920x1080"), {"text": "A"}) is None
+    assert cache.stats == {"hits": 1, "misses": 1, "entries": 0}
+
+
+def test_cached_click_is_one_request(library, stub):
+    library.enable_coordinate_cache()
+    library.click_element_by_locator(text="Login")
+    requests = stub.requests
+    library.click_element_by_locator(text="Login")
+    assert stub.requests - requests == 1
+    assert library.disable_coordinate_cache()["hits"] == 1
+
+
+def test_coordinate_cache_without_device():
+    lib = Uiautomator2Library()
+    with pytest.raises(ConnectionError):
+        lib.enable_coordinate_cache()
+    assert lib.disable_coordinate_cache() is None
@@ -0,0 +1,15 @@
+# -*- coding:utf-8 -*-
+import pytest
+
+from Uiautomator2Library import Uiautomator2Library
+
+
+def test_device_health_without_device():
+    with pytest.raises(ConnectionError):
+        Uiautomator2Library().get_device_health()
+
+
+def test_device_health_without_monitor(library):
+    assert library.get_device_health() is None
+    with pytest.raises(ValueError):
+        library.get_device_health("unknown")
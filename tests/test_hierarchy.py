@@ -0,0 +1,98 @@
+# -*- coding:utf-8 -*-
+import pytest
+
+from Uiautomator2Library.hierarchy import HierarchyCache, LocatorIndex, hierarchy_digest, iter_page_text, node_center, \
+    node_info
+
+SOURCE = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.demo" content-desc=""
+        clickable="false" scrollable="false" bounds="[0,0][1080,1920]">
+    <node index="0" text="User name" resource-id="com.demo:id/username" class="android.widget.EditText"
+          package="com.demo" content-desc="" clickable="true" scrollable="false" bounds="[100,200][980,300]" />
+    <node index="1" text="Login" resource-id="com.demo:id/login" class="android.widget.Button"
+          package="com.demo" content-desc="Log in" clickable="true" scrollable="false" bounds="[100,400][980,500]" />
+    <node index="2" text="Login help" resource-id="com.demo:id/help" class="android.widget.TextView"
+          package="com.demo" content-desc="" clickable="false" scrollable="false" bounds="[100,600][980,700]" />
+  </node>
+  <node index="1" text="12:00" resource-id="" class="android.widget.TextView" package="com.android.systemui"
+        content-desc="" clickable="false" scrollable="false" bounds="[0,0][200,50]" />
+</hierarchy>"""
+
+
+def texts(nodes) -> list:
+    return [node.get("text") for node in nodes]
+
+
+@pytest.mark.parametrize("locator, expected", [
+    ({"text": "Login"}, ["Login"]),
+    ({"textContains": "Login"}, ["Login", "Login help"]),
+    ({"textStartsWith": "User"}, ["User name"]),
+    ({"textMatches": "Login.*"}, ["Login", "Login help"]),
+    ({"resourceIdMatches": ".*:id/log.*"}, ["Login"]),
+    ({"className": "android.widget.Button", "description": "Log in"}, ["Login"]),
+    ({"descriptionContains": "Log"}, ["Login"]),
+    ({"clickable": True}, ["User name", "Login"]),
+    ({"clickable": "false", "packageName": "com.demo", "index": 2}, ["Login help"]),
+    ({"textContains": "Login", "instance": 1}, ["Login help"]),
+    ({"text": "Logout"}, []),
+])
+def test_locator_index_find(locator, expected):
+    assert texts(LocatorIndex(SOURCE).find(**locator)) == expected
+
+
+def test_locator_index_supports():
+    assert LocatorIndex.supports({"text": "A", "resourceIdMatches": ".*", "index": 0, "instance": 1})
+    assert not LocatorIndex.supports({"childSelector": {}})
+    with pytest.raises(TypeError):
+        LocatorIndex(SOURCE).find(fromParent="x")
+
+
+def test_locator_index_info():
+    index = LocatorIndex(SOURCE)
+    info = index.info(text="Login")
+    assert info["resourceName"] == "com.demo:id/login"
+    assert info["bounds"] == {"left": 100, "top": 400, "right": 980, "bottom": 500}
+    assert info["clickable"] is True and info["scrollable"] is False
+    assert index.info(text="Logout") is None
+    assert index.count(packageName="com.demo") == 4
+
+
+def test_node_info_and_center():
+    node = LocatorIndex(SOURCE).find(text="User name")[0]
+    assert node_center(node) == (540, 250)
+    assert node_info(node)["className"] == "android.widget.EditText"
+
+
+def test_iter_page_text():
+    assert list(iter_page_text(SOURCE, description=False)) == ["User name", "Login", "Login help", "12:00"]
+    assert list(iter_page_text(SOURCE, class_names=["android.widget.Button"])) == ["Login", "Log in"]
+    assert list(iter_page_text(SOURCE, packages=["com.demo"], bounds=(0, 350, 1080, 1920))) == \
+        ["Login", "Log in", "Login help"]
+
+
+def test_hierarchy_digest_ignores_status_bar():
+    assert hierarchy_digest(SOURCE) == hierarchy_digest(SOURCE.replace("12:00", "12:01"))
+    assert hierarchy_digest(SOURCE) != hierarchy_digest(SOURCE.replace("Login help", "Help"))
+
+
+class DumpDevice(object):
+    def __init__(self, source):
+        self.source = source
+        self.dumps = 0
+
+    def dump_hierarchy(self):
+        self.dumps += 1
+        return self.source
+
+
+def test_hierarchy_cache_dumps_once_per_snapshot():
+    device = DumpDevice(SOURCE)
+    cache = HierarchyCache(device)
+    assert cache.index.exists(text="Login")
+    assert cache.source is cache.index.source
+    cache.invalidate()
+    device.source = SOURCE.replace("Login", "Sign in")
+    assert cache.index.exists(text="Sign in")
+    assert cache.refresh() == device.source
+    assert device.dumps == cache.dump_count == 3
@@ -0,0 +1,88 @@
+# -*- coding:utf-8 -*-
+import hashlib
+import stat
+
+from Uiautomator2Library import install
+from Uiautomator2Library.install import apk_package, install_apk, installed_digest, local_digest
+
+
+def fake_tool(directory, name, output):
+    """ Executable printing output, stands in for an Android SDK tool on PATH """
+    (directory / f"{name}.out").write_text(output + "\n")
+    path = directory / name
+    path.write_text(f"#!/bin/sh\nexec /bin/cat '{directory / name}.out'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+def test_apk_package_with_aapt(tmp_path, monkeypatch):
+    monkeypatch.setattr(install, "_apkutils_package", lambda path: None)
+    tools = tmp_path / "bin"
+    tools.mkdir()
+    fake_tool(tools, "aapt", "package: name='com.demo' versionCode='3' versionName='1.2'\nsdkVersion:'21'")
+    monkeypatch.setenv("PATH", str(tools))
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"apk")
+    assert apk_package(str(apk)) == "com.demo"
+
+
+def test_apk_package_with_apkanalyzer(tmp_path, monkeypatch):
+    monkeypatch.setattr(install, "_apkutils_package", lambda path: None)
+    tools = tmp_path / "bin"
+    tools.mkdir()
+    fake_tool(tools, "apkanalyzer", "com.other")
+    monkeypatch.setenv("PATH", str(tools))
+    apk = tmp_path / "other.apk"
+    apk.write_bytes(b"other")
+    assert apk_package(str(apk)) == "com.other"
+
+
+def test_apk_package_without_tools(tmp_path, monkeypatch):
+    monkeypatch.setattr(install, "_apkutils_package", lambda path: None)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    apk = tmp_path / "none.apk"
+    apk.write_bytes(b"none")
+    assert apk_package(str(apk)) is None
+
+
+class ShellDevice(object):
+    """ Device answering shell calls with output and recording app installs """
+
+    def __init__(self, output=""):
+        self.output = output
+        self.commands = []
+        self.installed = []
+
+    def shell(self, command):
+        self.commands.append(command)
+        return self.output, 0
+
+    def app_install(self, data):
+        self.installed.append(data)
+
+
+def test_local_digest(tmp_path):
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"build 1")
+    digest = local_digest(str(apk))
+    assert digest == hashlib.sha256(b"build 1").hexdigest()
+    apk.write_bytes(b"build 22")
+    assert local_digest(str(apk)) == hashlib.sha256(b"build 22").hexdigest()
+
+
+def test_installed_digest():
+    digest = hashlib.sha256(b"apk").hexdigest()
+    device = ShellDevice(f"{digest}  /data/app/com.demo-1/base.apk\n")
+    assert installed_digest(device, "com.demo", 3) == digest
+    assert "pm path com.demo" in device.commands[0] and '= "3" ]' in device.commands[0]
+    assert installed_digest(ShellDevice(""), "com.demo", 3) is None
+    assert installed_digest(ShellDevice("sha256sum: not found\n"), "com.demo", 3) is None
+
+
+def test_install_apk_skips_same_build(tmp_path):
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"apk")
+    device = ShellDevice(f"{hashlib.sha256(b'apk').hexdigest()}  /data/app/base.apk\n")
+    assert install_apk(device, str(apk), "com.demo") is False
+    assert install_apk(device, str(apk), "com.demo", cache=False) is True
+    assert install_apk(ShellDevice(""), str(apk), "com.demo") is True
+    assert device.installed == [str(apk)]
@@ -0,0 +1,60 @@
+# -*- coding:utf-8 -*-
+import pytest
+
+from Uiautomator2Library.launch import LaunchTimes, launch_command, parse_am_start
+
+AM_START = """Starting: Intent { act=android.intent.action.MAIN cat=[android.intent.category.LAUNCHER] cmp=com.demo/.Main }
+Status: ok
+LaunchState: COLD
+Activity: com.demo/.MainActivity
+TotalTime: 512
+WaitTime: 530
+Complete
+"""
+
+
+def test_launch_command_modes():
+    cold = launch_command("com.demo", ".MainActivity")
+    assert cold == "am start -W -S -a android.intent.action.MAIN -c android.intent.category.LAUNCHER " \
+                   "-n com.demo/.MainActivity"
+    assert "-S " not in launch_command("com.demo", ".MainActivity", "warm")
+    hot = launch_command("com.demo", ".MainActivity", "hot")
+    assert hot.startswith("input keyevent 3; am start -W -a ")
+
+
+def test_launch_command_resolves_launcher_activity():
+    command = launch_command("com.demo")
+    assert "-n $(cmd package resolve-activity --brief" in command
+    assert "com.demo | tail -n 1)" in command
+
+
+def test_launch_command_unknown_mode():
+    with pytest.raises(ValueError):
+        launch_command("com.demo", mode="lukewarm")
+
+
+def test_parse_am_start():
+    assert parse_am_start(AM_START) == {"status": "ok", "launch_state": "COLD", "activity": "com.demo/.MainActivity",
+                                        "total_time": 0.512, "wait_time": 0.53}
+
+
+def test_parse_am_start_without_times():
+    launch = parse_am_start("Warning: Activity not started, its current task has been brought to the front\n"
+                            "Status: ok\nActivity: com.demo/.MainActivity\nWaitTime: 12\n")
+    assert launch["status"] == "ok"
+    assert launch["launch_state"] is None and launch["total_time"] is None
+    assert parse_am_start(None)["status"] is None
+
+
+def test_launch_times_summary():
+    times = LaunchTimes()
+    for total in (0.5, 0.7, 0.6):
+        times.add("com.demo", {"launch_state": "COLD", "total_time": total, "ready_time": None})
+    times.add("com.demo", {"launch_state": None, "total_time": None, "ready_time": 1.0})
+    summary = times.summary()["com.demo"]
+    assert summary["COLD"]["count"] == 3
+    assert summary["COLD"]["total_time"]["p50"] == 0.6
+    assert summary["COLD"]["ready_time"] is None
+    assert summary["UNKNOWN"]["ready_time"]["max"] == 1.0
+    times.reset()
+    assert times.summary() == {}
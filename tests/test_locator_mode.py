@@ -0,0 +1,29 @@
+# -*- coding:utf-8 -*-
+
+
+def test_local_queries_share_one_dump(library):
+    library.set_locator_mode("local")
+    dumps = library.hierarchy.dump_count
+    assert library.element_is_existed_by_locator(text="Login")
+    assert library.get_element_attribute_by_locator("text", resourceId="com.demo:id/login") == "Login"
+    assert library.get_elements_count_by_locator(3, className="android.widget.EditText") == 2
+    assert library.hierarchy.dump_count - dumps == 1
+
+
+def test_local_query_dumps_again_on_miss(library, stub):
+    library.set_locator_mode("local")
+    library.refresh_hierarchy()
+    stub.hierarchy = stub.hierarchy.replace('text="Login"', 'text="Sign in"')
+    dumps = library.hierarchy.dump_count
+    assert library.element_is_existed_by_locator(text="Sign in")
+    assert library.hierarchy.dump_count - dumps == 1
+
+
+def test_local_query_dumps_again_after_click(library):
+    library.set_locator_mode("local")
+    library.set_click_stabilization(0)
+    assert library.element_is_existed_by_locator(text="Login")
+    library.click_element_by_locator(text="Login")
+    dumps = library.hierarchy.dump_count
+    assert library.element_is_existed_by_locator(text="Login")
+    assert library.hierarchy.dump_count - dumps == 1
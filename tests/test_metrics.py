@@ -0,0 +1,41 @@
+# -*- coding:utf-8 -*-
+import time
+
+from Uiautomator2Library.metrics import KeywordMetrics, metrics, stats
+from Uiautomator2Library.wait import wait_until
+
+
+def test_stats():
+    assert stats([3, 1, 2, 4]) == {"total": 10, "p50": 2, "p95": 4, "max": 4}
+
+
+def test_waiting_counts_block_as_wait():
+    keyword_metrics = KeywordMetrics()
+    keyword_metrics.start("Keyword")
+    with keyword_metrics.waiting():
+        time.sleep(0.05)
+    keyword_metrics.stop()
+    item = keyword_metrics.summary()["Keyword"]
+    assert item["wait"]["total"] >= 0.05
+    assert item["execute"]["total"] < 0.05
+
+
+def test_wait_until_counts_only_sleeps():
+    def condition():
+        time.sleep(0.05)
+        return False
+
+    metrics.reset()
+    metrics.start("Wait")
+    result = wait_until(condition, 0.1, interval=0.01, max_interval=0.01)
+    metrics.stop()
+    wait = metrics.summary()["Wait"]["wait"]["total"]
+    assert not result
+    assert wait == result.slept
+    assert wait < result.elapsed - 0.05 * (result.attempts - 1)
+
+
+def test_actions_keywords_are_measured(library):
+    metrics.reset()
+    library.switch_device("stub")
+    assert "switch_device" in library.get_keyword_metrics()
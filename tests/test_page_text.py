@@ -0,0 +1,21 @@
+# -*- coding:utf-8 -*-
+
+
+def test_page_text_reads_the_screen(library, stub):
+    assert "Login" in library.dev_get_page_text()
+    stub.hierarchy = stub.hierarchy.replace('text="Login"', 'text="Sign in"')
+    texts = library.dev_get_page_text()
+    assert "Sign in" in texts and "Login" not in texts
+
+
+def test_page_text_reads_the_snapshot_without_refresh(library, stub):
+    library.refresh_hierarchy()
+    stub.hierarchy = stub.hierarchy.replace('text="Login"', 'text="Sign in"')
+    dumps = library.hierarchy.dump_count
+    assert "Login" in library.dev_get_page_text(refresh=False)
+    assert library.hierarchy.dump_count == dumps
+
+
+def test_page_text_filters(library):
+    texts = library.dev_get_page_text(class_name="android.widget.Button")
+    assert texts == ["Login"]
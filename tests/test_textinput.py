@@ -0,0 +1,32 @@
+# -*- coding:utf-8 -*-
+from Uiautomator2Library.textinput import KEYCODE_PASTE, chunks, input_clipboard
+
+
+def recording(stub) -> list:
+    """ List of the (method, params) JSON-RPC calls the stub answers """
+    calls = []
+    answer = stub.result
+
+    def result(method, params):
+        calls.append((method, params))
+        return answer(method, params)
+
+    stub.result = result
+    return calls
+
+
+def test_chunks():
+    assert chunks("abcde", 2) == ["ab", "cd", "e"]
+    assert chunks("", 2) == [""]
+
+
+def test_clipboard_sets_and_pastes_whole_text_once(library, stub):
+    text = "x" * 40000
+    device = library.device
+    calls = recording(stub)
+    requests = stub.requests
+    input_clipboard(device, text)
+    assert [method for method, _ in calls] == ["clearTextField", "setClipboard", "pressKeyCode"]
+    assert calls[1][1] == [None, text]
+    assert calls[2][1] == [KEYCODE_PASTE]
+    assert stub.requests - requests == 1
@@ -0,0 +1,56 @@
+# -*- coding:utf-8 -*-
+from Uiautomator2Library.hierarchy import page_overlap
+from Uiautomator2Library.metrics import metrics
+
+ROW = '<node class="android.widget.TextView" resource-id="com.demo:id/title" text="{}" bounds="[0,{}][1080,{}]" />'
+TITLE = '//*[@resource-id="com.demo:id/title"]'
+
+
+def page(*titles) -> str:
+    rows = "".join(ROW.format(title, index * 100, index * 100 + 90) for index, title in enumerate(titles))
+    return ('<hierarchy rotation="0"><node class="android.widget.ListView" resource-id="com.demo:id/list" '
+            f'scrollable="true" bounds="[0,0][1080,1920]">{rows}</node></hierarchy>')
+
+
+def scrolling(stub, pages):
+    """ Show the next page of pages on each scroll forward """
+    answer = stub.result
+    stub.hierarchy = pages.pop(0)
+
+    def result(method, params):
+        if method == "scrollForward" and pages:
+            stub.hierarchy = pages.pop(0)
+        return answer(method, params)
+
+    stub.result = result
+
+
+def test_page_overlap():
+    assert page_overlap([], ["a"]) == 0
+    assert page_overlap(["a", "b", "c"], ["b", "c", "d"]) == 2
+    assert page_overlap(["a", "b"], ["c", "d"]) == 0
+    assert page_overlap(["x", "a"], ["a", "a", "b"]) == 1
+    assert page_overlap(["a", "a"], ["a", "a"]) == 2
+
+
+def test_iter_elements_keeps_new_rows_identical_to_seen_rows(library, stub):
+    scrolling(stub, [page("A", "B", "C"), page("B", "C", "A", "A"), page("A", "A", "D")])
+    titles = [element.attrib["text"] for element in library.iter_elements_by_xpath(TITLE)]
+    assert titles == ["A", "B", "C", "A", "A", "D"]
+
+
+def test_iter_elements_stops_on_unchanged_page(library, stub):
+    scrolling(stub, [page("A", "B")])
+    dumps = library.hierarchy.dump_count
+    assert [element.attrib["text"] for element in library.iter_elements_by_xpath(TITLE)] == ["A", "B"]
+    assert library.hierarchy.dump_count - dumps == 2
+
+
+def test_iter_elements_is_measured_while_iterating(library, stub):
+    scrolling(stub, [page("A", "B"), page("B", "C")])
+    metrics.reset()
+    for _ in library.iter_elements_by_xpath(TITLE):
+        pass
+    item = metrics.summary()["iter_elements_by_xpath"]
+    assert item["count"] == 1
+    assert item["rpc"]["total"] > 0